@@ -1,34 +1,178 @@
 #Flask + SQLAlchemy Authentication System for Medinsight
-from flask import Flask, render_template,request, redirect, url_for, flash, session,send_file,jsonify
+from flask import Flask, Blueprint, current_app, render_template,request, redirect, url_for, flash, session,send_file,jsonify,Response,stream_with_context
+from collections import defaultdict, Counter
 from flask_sqlalchemy import SQLAlchemy
-from huggingface_hub import InferenceClient
-from flask_bcrypt import Bcrypt
+from werkzeug.local import LocalProxy
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import os
-import joblib
+import codecs
+import math
+import atexit
+import json
+import csv
+import shutil
+import tempfile
+from itertools import islice
+import numpy as np
 from datetime import datetime
-import matplotlib.pyplot as plt
-from io import BytesIO
-from fpdf import FPDF
-
-
-# Initialize Hugging Face client using Fireworks
-chatbot_client = InferenceClient(
-    provider="fireworks-ai",
-    api_key=HF_TOKEN,
-)
-
-
-app = Flask(__name__)
-app.secret_key = 'supersecretekey'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-#initialize DB and Bcrypt
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
+from io import BytesIO, StringIO, TextIOWrapper
+from model_registry import ModelRegistry, MODEL_SPECS
+import inference
+from batcher import MicroBatcher
+import database
+from charts import ChartService, COMPARISON_SERIES, PREDICTION_CHARTS, chart_key
+from report_writer import ReportWriter
+import exports
+from chat import ChatService, ChatBusy
+from auth import AuthService, AuthBusy
+from caching import LRUCache
+import migrations
+import metrics
+
+
+# Hugging Face client using Fireworks, or any OpenAI-compatible server (e.g. chat_stub.py) via CHAT_BASE_URL
+def make_chat_client(timeout):
+    # imported on first chat request; huggingface_hub is slow to import
+    from huggingface_hub import InferenceClient
+    base_url = os.environ.get('CHAT_BASE_URL')
+    if base_url:
+        return InferenceClient(base_url=base_url, api_key=os.environ.get('HF_TOKEN', 'stub'), timeout=timeout)
+    return InferenceClient(provider="fireworks-ai", api_key=os.environ.get('HF_TOKEN'), timeout=timeout)
+
+
+db = SQLAlchemy()
+
+#every route lives on this blueprint; create_app() registers it
+main = Blueprint('main', __name__, cli_group=None)
+
+
+class Services:
+    """Service objects of one app, built by init_services() and kept in app.extensions."""
+
+    def __init__(self, auth, registry, prediction_cache, batchers, charts, report_writer, chatbot):
+        self.auth = auth
+        self.registry = registry
+        self.prediction_cache = prediction_cache
+        self.batchers = batchers
+        self.charts = charts
+        self.report_writer = report_writer
+        self.chatbot = chatbot
+
+    def stop(self):
+        # flush queued reports and rows, then stop the background threads
+        if self.report_writer is not None:
+            self.report_writer.stop()
+        for batcher in self.batchers.values():
+            batcher.stop()
+        self.charts.stop()
+        self.auth.stop()
+
+
+def services(app=None):
+    return (app or current_app).extensions['mediinsight']
+
+#the current app's services, so several apps in one process never share them
+auth = LocalProxy(lambda: services().auth)
+registry = LocalProxy(lambda: services().registry)
+prediction_cache = LocalProxy(lambda: services().prediction_cache)
+batchers = LocalProxy(lambda: services().batchers)
+charts = LocalProxy(lambda: services().charts)
+chatbot = LocalProxy(lambda: services().chatbot)
+
+
+def configure(app, overrides=None):
+    app.secret_key = 'supersecretekey'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database.DATABASE_URI
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.ENGINE_OPTIONS
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    #bcrypt work factor; stored hashes with a different cost are upgraded at login
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    #hash threads, and how many hash jobs may wait before logins are turned away
+    app.config['AUTH_WORKERS'] = int(os.environ.get('AUTH_WORKERS', 4))
+    app.config['AUTH_MAX_PENDING'] = int(os.environ.get('AUTH_MAX_PENDING', 64))
+    #pre-render the common result charts in the background at startup
+    app.config['CHART_WARM'] = True
+    #max bytes of rendered chart PNGs kept in memory
+    app.config['CHART_CACHE_BYTES'] = 32 * 1024 * 1024
+    #create missing tables and run migrations when the app is created (a no-op once the schema is current)
+    app.config['AUTO_MIGRATE'] = True
+
+    #seconds between checks of the model files for a new version
+    app.config['MODEL_RELOAD_INTERVAL'] = 2.0
+    #single-row prediction cache: entries kept and decimals the features are rounded to
+    app.config['PREDICTION_CACHE_SIZE'] = 10000
+    app.config['PREDICTION_CACHE_DECIMALS'] = 6
+    #micro-batching of concurrent form predictions: on/off, max rows per batch, max wait
+    app.config['PREDICTION_BATCHING'] = os.environ.get('PREDICTION_BATCHING', '0') == '1'
+    app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', 64))
+    app.config['BATCH_MAX_WAIT_MS'] = float(os.environ.get('BATCH_MAX_WAIT_MS', 2))
+
+    #chat model, per-call timeout in seconds and max provider calls at once
+    app.config['CHAT_MODEL'] = "meta-llama/Meta-Llama-3-8B-Instruct"
+    app.config['CHAT_TIMEOUT'] = float(os.environ.get('CHAT_TIMEOUT', 30))
+    app.config['CHAT_MAX_CONCURRENT'] = int(os.environ.get('CHAT_MAX_CONCURRENT', 4))
+
+    #max rows accepted by one batch API call
+    app.config['API_MAX_BATCH_ROWS'] = 50000
+    #how reports are persisted:
+    #  sync  - each request commits its own reports
+    #  group - requests queue reports and wait for a shared group commit
+    #  async - requests return immediately; queued reports are lost on a crash
+    app.config['REPORT_WRITE_MODE'] = os.environ.get('REPORT_WRITE_MODE', 'sync')
+    #group commit bounds for the write-behind modes: max rows and max seconds of waiting
+    app.config['REPORT_WRITE_BATCH'] = 500
+    app.config['REPORT_WRITE_DELAY'] = 0.05
+    #rows fetched per chunk for streamed CSV exports, reports per batch PDF
+    app.config['EXPORT_CHUNK_ROWS'] = 1000
+    app.config['PDF_BATCH_MAX_REPORTS'] = 500
+    #rows per page on the admin dashboard and on a user's report history
+    app.config['ADMIN_PAGE_SIZE'] = 50
+    app.config['DASHBOARD_PAGE_SIZE'] = 20
+    #rows scored and committed together when streaming a CSV upload
+    app.config['CSV_CHUNK_ROWS'] = 2000
+    #opt-in profiling: requests slower than PROFILE_SLOW_MS get a cProfile dump in PROFILE_DIR
+    app.config['PROFILE_SLOW_MS'] = float(os.environ['PROFILE_SLOW_MS']) if os.environ.get('PROFILE_SLOW_MS') else None
+    app.config['PROFILE_DIR'] = os.path.join(os.path.dirname(database.DB_PATH), 'profiles')
+
+    app.config.update(overrides or {})
+
+def score_loaded(loaded, matrix):
+    # one predict_proba call gives both the labels and the positive-class probabilities
+    proba = loaded.engine.predict_proba(matrix)
+    return loaded.engine.classes_[proba.argmax(axis=1)], proba[:, 1]
+
+def batch_predictor(registry, name):
+    # runs on the batcher thread, outside the app context, so it gets the registry itself
+    def predict_batch(matrix):
+        loaded = registry.get(name)
+        predictions, probabilities = score_loaded(loaded, matrix)
+        return list(zip(predictions.tolist(), probabilities.tolist())), loaded.version
+    return predict_batch
+
+def predict_row(spec, values):
+    # repeated feature vectors skip sklearn validation and predict entirely
+    loaded = registry.get(spec['name'])
+    key = (spec['name'], loaded.version,
+           tuple(round(float(v), current_app.config['PREDICTION_CACHE_DECIMALS']) for v in values))
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return cached + (loaded.version,)
+    with metrics.stage('inference'):
+        if spec['name'] in batchers:
+            (prediction, probability), version = batchers[spec['name']].predict(values)
+        else:
+            predictions, probabilities = score_loaded(loaded, [values])
+            prediction, probability, version = predictions[0], probabilities[0], loaded.version
+    scored = (int(prediction), float(probability))
+    if version == loaded.version:
+        prediction_cache.put(key, scored)
+    return scored + (version,)
 
-tumor_model = joblib.load("models/tumor_model.pkl")
-diabetes_model = joblib.load("models/diabetes_model.pkl")
+def prediction_chart_url(model, probability):
+    # the URL carries the chart inputs, so whichever worker serves it can render it
+    charts.prediction(model, probability)
+    return url_for('main.prediction_chart', model=model, bucket=charts.bucket(probability))
 
 
 #user model
@@ -47,29 +191,92 @@ class Report(db.Model):
     input_data = db.Column(db.String(256), nullable=False)
     result = db.Column(db.String(256), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    model_version = db.Column(db.String(64), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    features = db.Column(db.JSON, nullable=True)  # numeric inputs keyed by feature name
+    probability = db.Column(db.Float, nullable=True)  # positive-class probability at prediction time
+
+    __table_args__ = (
+        # keyset pagination on the admin dashboard walks (timestamp, id)
+        db.Index('ix_report_timestamp_id', 'timestamp', 'id'),
+        # per-user history and dashboard counts
+        db.Index('ix_report_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_report_model_type_result', 'model_type', 'result'),
+        # ids are never reused, so a report id stays unique across the live and archive databases
+        {'sqlite_autoincrement': True},
+    )
     
-  
+
+#precomputed report counts per (user, model, result, day), kept in step with Report
+class ReportStat(db.Model):
+    __tablename__ = 'report_stat'
+    user_id = db.Column(db.Integer, primary_key=True)  # 0 for reports without a user
+    model_type = db.Column(db.String(100), primary_key=True)  # '' when unknown
+    result = db.Column(db.String(256), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+def record_stats(reports, sign=1):
+    # upsert the counters in the caller's transaction; sign=-1 when reports are deleted
+    counts = Counter()
+    for report in reports:
+        get = report.get if isinstance(report, dict) else lambda name: getattr(report, name)
+        counts[(get('user_id') or 0, get('model_type') or '', get('result'), get('timestamp').date())] += sign
+    if not counts:
+        return
+    rows = [
+        {'user_id': user_id, 'model_type': model_type, 'result': result, 'day': day, 'count': count}
+        for (user_id, model_type, result, day), count in counts.items()
+    ]
+    stmt = sqlite_insert(ReportStat).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'model_type', 'result', 'day'],
+        set_={'count': ReportStat.count + stmt.excluded.count},
+    )
+    db.session.execute(stmt)
+    if sign < 0:
+        db.session.execute(db.delete(ReportStat).where(ReportStat.count <= 0))
+
+def stat_counts(*group_by, **filters):
+    # summed counters grouped by the given ReportStat columns
+    query = db.session.query(*group_by, db.func.sum(ReportStat.count))
+    for name, value in filters.items():
+        query = query.filter(getattr(ReportStat, name) == value)
+    if group_by:
+        query = query.group_by(*group_by).order_by(*group_by)
+    return query.all()
+
 #create database
-with app.app_context():
-    db.create_all()
+def init_db(app, force=False):
+    # one-time schema work, run at startup or via `flask --app app init-db`, never per request
+    with app.app_context():
+        if not force and migrations.schema_version(db.engine) >= migrations.SCHEMA_VERSION:
+            return
+        db.create_all()
+        migrations.upgrade(db.engine)
+
+        if not User.query.filter_by(username='admin').first():
+            hashed_pw = auth.hash_password('admin123')
+            admin_user = User(username='admin', email='admin@example.com', password=hashed_pw, is_admin=True) #True = 1
+            db.session.add(admin_user)
+            db.session.commit()
+        migrations.mark_current(db.engine)
 
-    if not User.query.filter_by(username='admin').first():
-        hashed_pw = bcrypt.generate_password_hash('admin123').decode('utf-8')
-        admin_user = User(username='admin', email='admin@example.com', password=hashed_pw, is_admin=True) #True = 1
-        db.session.add(admin_user)
-        db.session.commit()
+        print("✅ Admin account created successfully.")
+        print("✅ Database initialized successfully.")
 
+@main.cli.command('init-db')
+def init_db_command():
+    """Create missing tables, run migrations and seed the admin account."""
+    init_db(current_app, force=True)
 
-    print("✅ Admin account created successfully.")
-    print("✅ Database initialized successfully.")
-    
 # Home route
-@app.route('/')
+@main.route('/')
 def home():
     return render_template('home.html')
 
 # Sign up
-@app.route('/signup',methods = ['GET','POST'])
+@main.route('/signup',methods = ['GET','POST'])
 def signup():
     if request.method == 'POST':
         username = request.form['username']
@@ -77,165 +284,234 @@ def signup():
         password = request.form['password']
         if User.query.filter_by(username=username).first():
             flash("Username already exists")
-            return redirect(url_for('signup'))
+            return redirect(url_for('main.signup'))
         if User.query.filter_by(email=email).first():
             flash("Email already registered")
-            return redirect(url_for('signup'))
+            return redirect(url_for('main.signup'))
 
-        hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
+        try:
+            hashed_pw = auth.hash_password(password)
+        except AuthBusy as e:
+            flash(str(e))
+            return redirect(url_for('main.signup'))
         new_user = User(username=username, email=email, password=hashed_pw)
         db.session.add(new_user)
         db.session.commit()
         flash("Signup successful. Please log in.")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('signup.html')
 
 # Login
-@app.route('/login',methods = ['GET','POST'])
+@main.route('/login',methods = ['GET','POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
-        print("Form data:", username, password)
-        print("User from DB:", user)
-        if user and bcrypt.check_password_hash(user.password,password):
+        try:
+            valid, upgraded_hash = auth.check_and_upgrade(user.password, password) if user else (False, None)
+        except AuthBusy as e:
+            flash(str(e))
+            return redirect(url_for('main.login'))
+        if valid:
+            if upgraded_hash:
+                # stored cost differs from BCRYPT_LOG_ROUNDS, save the rehash
+                user.password = upgraded_hash
+                db.session.commit()
             session['user'] = user.username
-            return redirect(url_for('dashboard'))
+            session['user_id'] = user.id
+            return redirect(url_for('main.dashboard'))
         else:
             flash("Invalid login credentials")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
     return render_template('login.html')
 
+def parse_report_cursor(value):
+    # cursor is "<iso timestamp>_<id>" of the last report on the previous page
+    try:
+        timestamp, report_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(report_id)
+    except (AttributeError, ValueError):
+        return None
+
+def keyset_page(query, page_size, after):
+    # newest reports first, the page after the (timestamp, id) cursor; returns (reports, next cursor or None)
+    cursor = parse_report_cursor(after)
+    if cursor:
+        query = query.filter(db.tuple_(Report.timestamp, Report.id) < cursor)
+    reports = query.order_by(Report.timestamp.desc(), Report.id.desc()).limit(page_size + 1).all()
+    if len(reports) <= page_size:
+        return reports, None
+    reports = reports[:page_size]
+    return reports, f"{reports[-1].timestamp.isoformat()}_{reports[-1].id}"
+
 #admin dashboard
-@app.route('/admin')
+@main.route('/admin')
 def admin_dashboard():
     if 'user' not in session:
         flash("Login required")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     user = User.query.filter_by(username=session['user']).first()
     if not user or not user.is_admin:
         flash("Unauthorized access")
-        return redirect(url_for('dashboard'))
-
-    all_users = User.query.all()
-    all_reports = Report.query.order_by(Report.timestamp.desc()).all()
-    total_reports = len(all_reports)
-    total_users = len(all_users)
-
-    return render_template("admin_dashboard.html", users=all_users, reports=all_reports,
-                           total_reports=total_reports, total_users=total_users)
+        return redirect(url_for('main.dashboard'))
+
+    page_size = current_app.config['ADMIN_PAGE_SIZE']
+    filters = {name: request.args.get(name, '').strip() for name in ('user', 'model_type', 'result')}
+    active_filters = {name: value for name, value in filters.items() if value}
+
+    # the username filter is resolved to user_id, which ix_report_user_id_timestamp covers
+    column_filters = {name: value for name, value in active_filters.items() if name != 'user'}
+    if 'user' in active_filters:
+        owner = User.query.filter_by(username=active_filters['user']).first()
+        column_filters['user_id'] = owner.id if owner else -1
+
+    # reports: newest first, keyset page after the (timestamp, id) cursor
+    report_query = Report.query
+    for name, value in column_filters.items():
+        report_query = report_query.filter(getattr(Report, name) == value)
+    reports, next_cursor = keyset_page(report_query, page_size, request.args.get('after'))
+
+    # users: keyset page on id
+    users_after = request.args.get('users_after', type=int, default=0)
+    users = User.query.filter(User.id > users_after).order_by(User.id).limit(page_size + 1).all()
+    next_users_after = None
+    if len(users) > page_size:
+        users = users[:page_size]
+        next_users_after = users[-1].id
+
+    # totals and the per-model breakdown come from the precomputed counters
+    total_users = db.session.query(db.func.count(User.id)).scalar()
+    total_reports = stat_counts()[0][0] or 0
+    breakdown = stat_counts(ReportStat.model_type, ReportStat.result, **column_filters)
+    matching_reports = sum(count for _, _, count in breakdown)
+
+    return render_template("admin_dashboard.html", users=users, reports=reports,
+                           total_reports=total_reports, total_users=total_users,
+                           matching_reports=matching_reports, breakdown=breakdown,
+                           filters=filters, active_filters=active_filters,
+                           model_types=[spec['model_type'] for spec in MODEL_SPECS.values()],
+                           results=[label for spec in MODEL_SPECS.values() for label in spec['labels']],
+                           next_cursor=next_cursor, next_users_after=next_users_after)
 
 #admin report deletion
-@app.route('/admin/delete_report/<int:report_id>')
+@main.route('/admin/delete_report/<int:report_id>')
 def delete_report(report_id):
     if 'user' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     user = User.query.filter_by(username=session['user']).first()
     if not user or not user.is_admin:
         flash("Unauthorized")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
 
     report = Report.query.get_or_404(report_id)
+    record_stats([report], sign=-1)
+    exports.forget_report(report)
     db.session.delete(report)
     db.session.commit()
     flash("Report deleted.")
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
 
 # Dashboard
-@app.route('/dashboard')
+@main.route('/dashboard')
 def dashboard():
     if 'user' not in session:
         flash("Please log in first")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
-    user_reports = Report.query.filter_by(user=session['user']).order_by(Report.timestamp.desc()).all()
+    # newest reports first, one keyset page at a time (same cursor as /admin)
+    user_reports, next_cursor = keyset_page(Report.query.filter_by(user_id=current_user_id()),
+                                            current_app.config['DASHBOARD_PAGE_SIZE'], request.args.get('after'))
 
-    # --- Chart Logic ---
-    from collections import defaultdict
-    import matplotlib.pyplot as plt
-    import os
+    # same counts -> same chart id, so repeat views come from the browser or memory cache
+    chart_id = charts.chart_id('comparison', comparison_counts(current_user_id()))
 
+    return render_template('dashboard.html', user=session['user'], reports=user_reports, next_cursor=next_cursor,
+                           chart_url=url_for('main.comparison_chart', chart_id=chart_id))
+
+def comparison_counts(user_id):
+    # per-model result counts for the dashboard comparison chart, from the precomputed counters
     model_data = defaultdict(lambda: {'Malignant Tumor': 0, 'Benign Tumor': 0, 'Diabetic': 0, 'Non-Diabetic': 0})
 
-    for r in user_reports:
-        if r.model_type == 'Tumor Prediction':
-            model_data['Tumor'][r.result] += 1
-        elif r.model_type == 'Diabetes Prediction':
-            model_data['Diabetes'][r.result] += 1
-
-    # Prepare chart
-    labels = []
-    benign = []
-    malignant = []
-    diabetic = []
-    nondiabetic = []
-
-    for model in model_data:
-        labels.append(model)
-        benign.append(model_data[model].get('Benign Tumor', 0))
-        malignant.append(model_data[model].get('Malignant Tumor', 0))
-        diabetic.append(model_data[model].get('Diabetic', 0))
-        nondiabetic.append(model_data[model].get('Non-Diabetic', 0))
-
-    x = range(len(labels))
-    fig, ax = plt.subplots()
-    ax.bar(x, benign, width=0.2, label='Benign Tumor', color='green')
-    ax.bar([i + 0.2 for i in x], malignant, width=0.2, label='Malignant Tumor', color='red')
-    ax.bar([i + 0.4 for i in x], diabetic, width=0.2, label='Diabetic', color='orange')
-    ax.bar([i + 0.6 for i in x], nondiabetic, width=0.2, label='Non-Diabetic', color='blue')
-
-    ax.set_xticks([i + 0.3 for i in x])
-    ax.set_xticklabels(labels)
-    ax.set_ylabel("Number of Predictions")
-    ax.set_title("Prediction Result Comparison")
-    ax.legend()
-    plt.tight_layout()
-
-    # Save chart
-    chart_path = os.path.join("static", "compare_chart.png")
-    plt.savefig(chart_path)
-    plt.close()
-
-    return render_template('dashboard.html', user=session['user'], reports=user_reports, chart_path=chart_path)
+    for model_type, result, count in stat_counts(ReportStat.model_type, ReportStat.result, user_id=user_id):
+        if model_type == 'Tumor Prediction':
+            model_data['Tumor'][result] += count
+        elif model_type == 'Diabetes Prediction':
+            model_data['Diabetes'][result] += count
+
+    return tuple(
+        (model, tuple(counts.get(series, 0) for series, _ in COMPARISON_SERIES))
+        for model, counts in model_data.items()
+    )
 
 #logout
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     session.pop('user',None)
+    session.pop('user_id',None)
     flash("Logged out successfully")
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
-@app.route('/chat', methods=['POST'])
+@main.route('/chat', methods=['POST'])
 def chat():
     user_input = request.json.get('message')
     if not user_input:
         return jsonify({'error': 'No input message provided'}), 400
 
     try:
-        completion = chatbot_client.chat.completions.create(
-            model="meta-llama/Meta-Llama-3-8B-Instruct",
-            messages=[
-                {
-                    "role": "user",
-                    "content": user_input
-                }
-            ],
-        )
-        reply = completion.choices[0].message["content"]
+        with metrics.stage('llm'):
+            reply = chatbot.complete(user_input)
         return jsonify({'response': reply})
+    except ChatBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@main.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    # Server-Sent Events: one "token" event per delta, then "done" (or "error")
+    user_input = (request.get_json(silent=True) or {}).get('message')
+    if not user_input:
+        return jsonify({'error': 'No input message provided'}), 400
+
+    # the event generator runs after the app context is gone, so it keeps the service itself
+    bot = services().chatbot
+    reply = bot.cached(user_input)
+    if reply is not None:
+        return Response(sse('token', reply) + sse('done', {}), mimetype='text/event-stream')
+
+    try:
+        bot.acquire()
+    except ChatBusy as e:
+        return jsonify({'error': str(e)}), 503
+
+    def events():
+        try:
+            with metrics.stage('llm'):
+                for delta in bot.stream(user_input):
+                    yield sse('token', delta)
+            yield sse('done', {})
+        except Exception as e:
+            yield sse('error', {'error': str(e)})
+
+    response = Response(events(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # released when the response is closed, even if the client disconnects early
+    response.call_on_close(bot.release)
+    return response
 
-@app.route('/predict/tumor',methods=['GET','POST'])
+
+@main.route('/predict/tumor',methods=['GET','POST'])
 def predict_tumor():
     if 'user' not in session:
         flash("please log in first")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     if request.method == 'POST':
         try:
@@ -243,43 +519,39 @@ def predict_tumor():
             growth_rate = float(request.form['growth_rate'])
             roundness_score = float(request.form['roundness_score'])
             
-            prediction = tumor_model.predict([[size,growth_rate,roundness_score]])[0]
-            print("Prediction from model:", prediction)
+            prediction, probability, version = predict_row(MODEL_SPECS['tumor'], [size,growth_rate,roundness_score])
             result = "Malignant Tumor" if prediction == 1 else "Benign Tumor"
             
-            #plot chart
-            fig,ax = plt.subplots()
-            ax.bar(['Benign','Malignant'],[1 - prediction , prediction ], color=['green','red'])
-            ax.set_title('Tumor Prediction Result')
-            ax.set_ylabel('Probability')
-            plt.tight_layout()
-            plt.savefig('static/tumor_chart.png')
-            plt.close()
+            #chart is rendered off-thread and cached, the page only links to it
+            chart_url = prediction_chart_url('tumor', probability)
             
             #save report
-            new_report = Report(
-                user=session['user'],
+            save_reports([dict(
+                current_owner(),
                 model_type = "Tumor Prediction",
                 input_data=f"size={size},growth_rate={growth_rate},roundness_score={roundness_score}",
+                features={'size': size, 'growth_rate': growth_rate, 'roundness_score': roundness_score},
                 result=result,
-                timestamp=datetime.now()
-            )
-            db.session.add(new_report)
-            db.session.commit()
+                probability=probability,
+                timestamp=datetime.now(),
+                model_version=version
+            )])
             
-            return render_template('tumor_result.html', size=size, growth=growth_rate, roundness=roundness_score, result=result)
+            return render_template('tumor_result.html', size=size, growth=growth_rate, roundness=roundness_score, result=result,
+                                   probability=probability, chart_url=chart_url)
 
-        except:
+        except Exception as e:
+            current_app.logger.warning("Tumor prediction failed: %s", e)
             flash("Invalid input. Please enter all fields.")
-            return redirect(url_for('predict_tumor'))
+            return redirect(url_for('main.predict_tumor'))
 
     return render_template('tumor_form.html')
             
-@app.route('/predict/diabetes', methods=['GET', 'POST'])
+@main.route('/predict/diabetes', methods=['GET', 'POST'])
 def predict_diabetes():
     if 'user' not in session:
         flash("Please log in first")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     if request.method == 'POST':
         try:
@@ -287,95 +559,448 @@ def predict_diabetes():
             glucose = float(request.form['glucose'])
             bmi = float(request.form['bmi'])
 
-            pred = diabetes_model.predict([[preg, glucose, bmi]])[0]
+            pred, probability, version = predict_row(MODEL_SPECS['diabetes'], [preg, glucose, bmi])
             result = "Diabetic" if pred == 1 else "Non-Diabetic"
 
-            # Chart for prediction
-            fig, ax = plt.subplots()
-            ax.bar(['Non-diabetic', 'Diabetic'], [1 if pred == 0 else 0, 1 if pred == 1 else 0],
-                   color=['green', 'red'])
-            ax.set_title("Diabetes Prediction Result")
-            ax.set_ylabel("Prediction Score")
-            plt.tight_layout()
-
-            chart_path = f"static/{session['user']}_diabetes_chart.png"
-            plt.savefig(chart_path)
-            plt.close()
+            # Chart for prediction (rendered off-thread and cached)
+            chart_url = prediction_chart_url('diabetes', probability)
 
             # Save report to DB
-            new_report = Report(
-                user=session['user'],
+            save_reports([dict(
+                current_owner(),
                 model_type="Diabetes Prediction",
                 input_data=f"preg={preg},glucose={glucose},bmi={bmi}",
+                features={'preg': preg, 'glucose': glucose, 'bmi': bmi},
                 result=result,
-                timestamp=datetime.now()
-            )
-            db.session.add(new_report)
-            db.session.commit()
+                probability=probability,
+                timestamp=datetime.now(),
+                model_version=version
+            )])
 
             return render_template('diabetes_result.html',
                                    preg=preg, glucose=glucose, bmi=bmi,
-                                   result=result,
-                                   chart_path=chart_path)
+                                   result=result, probability=probability,
+                                   chart_url=chart_url)
 
         except Exception as e:
-            print("Error:", e)
+            current_app.logger.warning("Diabetes prediction failed: %s", e)
             flash("Invalid input. Try again.")
-            return redirect(url_for('predict_diabetes'))
+            return redirect(url_for('main.predict_diabetes'))
 
     return render_template('diabetes_form.html')
 
-@app.route('/chart')
+def current_user_id():
+    # sessions created before user_id was stored only carry the username
+    if 'user_id' not in session:
+        user = User.query.filter_by(username=session['user']).first()
+        session['user_id'] = user.id if user else None
+    return session['user_id']
+
+def current_owner():
+    # owner columns stamped on every report saved for the logged-in user
+    return {'user': session['user'], 'user_id': current_user_id()}
+
+#batch prediction helpers
+def rows_to_matrix(rows, features):
+    # rows can be dicts keyed by feature name or plain lists in feature order
+    matrix = np.array([[row[f] for f in features] if isinstance(row, dict) else row for row in rows],
+                      dtype=float)
+    if matrix.ndim != 2 or matrix.shape[1] != len(features):
+        raise ValueError(f"each row needs {len(features)} values: {', '.join(features)}")
+    if not np.isfinite(matrix).all():
+        raise ValueError("feature values must be finite numbers")
+    return matrix
+
+def score_matrix(spec, matrix):
+    # one vectorized call for the whole batch, labels taken from the same probabilities
+    loaded = registry.get(spec['name'])
+    with metrics.stage('inference'):
+        predictions, probabilities = score_loaded(loaded, matrix)
+    return predictions, probabilities, loaded.version
+
+def format_input(features, values):
+    return ",".join(f"{name}={float(value)}" for name, value in zip(features, values))
+
+def build_reports(spec, owner, matrix, labels, probabilities, version):
+    now = datetime.now()
+    return [
+        {
+            **owner,
+            'model_type': spec['model_type'],
+            'input_data': format_input(spec['features'], values),
+            'features': dict(zip(spec['features'], values)),
+            'result': label,
+            'probability': probability,
+            'timestamp': now,
+            'model_version': version,
+        }
+        for values, label, probability in zip(matrix.tolist(), labels, probabilities.tolist())
+    ]
+
+def write_reports(rows):
+    # single bulk insert (executemany) + commit for any number of reports
+    with metrics.stage('db_commit'):
+        if rows:
+            db.session.execute(db.insert(Report), rows)
+            record_stats(rows)
+        db.session.commit()
+
+def report_batch_writer(app):
+    def write_report_batch(rows):
+        # runs on the write-behind thread, outside any request
+        with app.app_context():
+            write_reports(rows)
+    return write_report_batch
+
+def save_reports(rows):
+    report_writer = services().report_writer
+    if report_writer is None:
+        write_reports(rows)
+        return
+    committed = report_writer.submit(rows)
+    if current_app.config['REPORT_WRITE_MODE'] == 'group':
+        # durable: wait until the shared commit containing these rows is done
+        committed.result()
+
+def read_batch_rows():
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        text = request.get_data(as_text=True)
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    # silent: malformed JSON falls through to the ValueError below, answered as a JSON 400
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('rows')
+    if not isinstance(payload, list):
+        raise ValueError("expected a JSON list of rows or {\"rows\": [...]}")
+    return payload
+
+@main.route('/api/predict/<model>', methods=['POST'])
+def api_predict(model):
+    if 'user' not in session:
+        return jsonify({'error': 'Login required'}), 401
+    spec = MODEL_SPECS.get(model)
+    if spec is None:
+        return jsonify({'error': f'Unknown model: {model}'}), 404
+
+    try:
+        rows = read_batch_rows()
+        if not rows:
+            return jsonify({'error': 'No rows provided'}), 400
+        if len(rows) > current_app.config['API_MAX_BATCH_ROWS']:
+            return jsonify({'error': f"At most {current_app.config['API_MAX_BATCH_ROWS']} rows per request"}), 413
+        matrix = rows_to_matrix(rows, spec['features'])
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid input: {e}'}), 400
+
+    predictions, probabilities, version = score_matrix(spec, matrix)
+    labels = [spec['labels'][int(p)] for p in predictions]
+    save_reports(build_reports(spec, current_owner(), matrix, labels, probabilities, version))
+
+    return jsonify({
+        'model': model,
+        'model_version': version,
+        'count': len(labels),
+        'results': [
+            {'prediction': int(p), 'result': label, 'probability': round(float(prob), 6)}
+            for p, label, prob in zip(predictions, labels, probabilities)
+        ],
+    })
+
+#CSV upload helpers
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def csv_encoding(source, chunk_size=1024 * 1024):
+    # UTF-8 (BOM optional) when the whole file decodes, otherwise cp1252 as written by Excel on Windows
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        while chunk := source.read(chunk_size):
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+    finally:
+        source.seek(0)
+
+def score_csv(spec, source, reader, owner, chunk_rows):
+    # generator: score and persist one chunk at a time, yield its CSV lines
+    try:
+        yield from _score_csv_chunks(spec, reader, owner, chunk_rows)
+    finally:
+        source.close()
+
+def _score_csv_chunks(spec, reader, owner, chunk_rows):
+    buf = StringIO()
+    writer = csv.writer(buf)
+
+    def flush():
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return data
+
+    writer.writerow(reader.fieldnames + ['prediction', 'result', 'probability'])
+    yield flush()
+
+    for chunk in iter_chunks(reader, chunk_rows):
+        values = []
+        for row in chunk:
+            try:
+                row_values = [float(row[f]) for f in spec['features']]
+            except (TypeError, ValueError):
+                row_values = None
+            # float() accepts "nan" and "inf", which the model rejects
+            values.append(row_values if row_values and all(map(math.isfinite, row_values)) else None)
+
+        valid = [v for v in values if v is not None]
+        if valid:
+            matrix = np.array(valid, dtype=float)
+            predictions, probabilities, version = score_matrix(spec, matrix)
+            labels = [spec['labels'][int(p)] for p in predictions]
+            save_reports(build_reports(spec, owner, matrix, labels, probabilities, version))
+            scored = iter(zip(predictions.tolist(), labels, probabilities.tolist()))
+
+        for row, value in zip(chunk, values):
+            original = [row.get(f) for f in reader.fieldnames]
+            if value is None:
+                writer.writerow(original + ['', 'Invalid input', ''])
+            else:
+                p, label, prob = next(scored)
+                writer.writerow(original + [p, label, round(prob, 6)])
+        yield flush()
+
+@main.route('/predict/<model>/upload', methods=['POST'])
+def predict_upload(model):
+    if 'user' not in session:
+        flash("Please log in first")
+        return redirect(url_for('main.login'))
+    spec = MODEL_SPECS.get(model)
+    if spec is None:
+        flash("Unknown model")
+        return redirect(url_for('main.dashboard'))
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Please choose a CSV file to upload.")
+        return redirect(url_for(f'main.predict_{model}'))
+
+    # the upload is closed with the request, so the stream reads from its own temp file copy
+    source = tempfile.TemporaryFile()
+    shutil.copyfileobj(upload.stream, source)
+    source.seek(0)
+    # undecodable bytes become U+FFFD, so such rows end up as 'Invalid input' instead of breaking the stream
+    reader = csv.DictReader(TextIOWrapper(source, encoding=csv_encoding(source), errors='replace', newline=''))
+    try:
+        fieldnames = reader.fieldnames or []
+    except csv.Error as e:
+        source.close()
+        flash(f"Could not read the CSV file: {e}")
+        return redirect(url_for(f'main.predict_{model}'))
+    missing = [f for f in spec['features'] if f not in fieldnames]
+    if missing:
+        source.close()
+        flash(f"CSV is missing columns: {', '.join(missing)}")
+        return redirect(url_for(f'main.predict_{model}'))
+
+    filename = f"{model}_predictions.csv"
+    return Response(
+        stream_with_context(score_csv(spec, source, reader, current_owner(), current_app.config['CSV_CHUNK_ROWS'])),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+def send_chart(kind, *args, private=False, immutable=True):
+    # chart ids are content hashes, so the image behind an id never changes
+    chart_id = chart_key(kind, *args)
+    if request.if_none_match.contains(chart_id):
+        response = Response(status=304)
+    else:
+        response = Response(charts.png(charts.chart_id(kind, *args)), mimetype='image/png')
+    response.set_etag(chart_id)
+    # charts built from a user's reports must not be stored by shared caches
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    if immutable:
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        # the URL does not change with the content: revalidate against the ETag
+        response.cache_control.no_cache = True
+    return response
+
+@main.route('/api/stats')
+def api_stats():
+    if 'user' not in session:
+        return jsonify({'error': 'Login required'}), 401
+    return jsonify({'prediction_cache': prediction_cache.stats(),
+                    'batchers': {name: b.stats() for name, b in batchers.items()}})
+
+@main.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text exposition format
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@main.route('/chart/prediction/<model>/<float:bucket>.png')
+def prediction_chart(model, bucket):
+    if model not in PREDICTION_CHARTS or not 0 <= bucket <= 1:
+        return "Unknown chart", 404
+    return send_chart('prediction', model, charts.bucket(bucket))
+
+@main.route('/chart/comparison/<chart_id>.png')
+def comparison_chart(chart_id):
+    # rebuilt from the logged-in user's counters, so any worker can serve it
+    if 'user' not in session:
+        return redirect(url_for('main.login'))
+    model_counts = comparison_counts(current_user_id())
+    current_id = chart_key('comparison', model_counts)
+    if current_id != chart_id:
+        # counts changed since the page was rendered
+        return redirect(url_for('main.comparison_chart', chart_id=current_id))
+    return send_chart('comparison', model_counts, private=True)
+
+@main.route('/chart')
 def chart():
     if 'user' not in session:
-        return redirect(url_for('login'))
-    reports = Report.query.filter_by(user=session['user']).all()
-    types = {}
-    for report in reports:
-        types[report.model_type] = types.get(report.model_type, 0) + 1
-
-    fig, ax = plt.subplots()
-    ax.bar(types.keys(), types.values(), color='skyblue')
-    ax.set_title("Your Prediction Usage")
-    ax.set_ylabel("Number of Predictions")
-    buf = BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    return send_file(buf, mimetype='image/png')
-
-@app.route('/download_report/<int:report_id>')
+        return redirect(url_for('main.login'))
+    types = dict(stat_counts(ReportStat.model_type, user_id=current_user_id()))
+
+    return send_chart('usage', tuple(types.items()), private=True, immutable=False)
+
+@main.route('/download_report/<int:report_id>')
 def download_report(report_id):
     report = Report.query.get_or_404(report_id)
     if report.user != session.get('user'):
         flash("Unauthorized access.")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
 
-    # Path of chart image if it exists
-    chart_path = f"static/{report.user}_diabetes_chart.png"
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"MediInsight Report", ln=1, align='C')
-    pdf.cell(200, 10, txt=f"Date: {report.timestamp.strftime('%Y-%m-%d %H:%M')}", ln=2)
-    pdf.cell(200, 10, txt=f"Model Type: {report.model_type}", ln=3)
-    pdf.cell(200, 10, txt=f"Input Data: {report.input_data}", ln=4)
-    pdf.cell(200, 10, txt=f"Result: {report.result}", ln=5)
-    
-    # Add chart image if it exists
-    if os.path.exists(chart_path):
-        pdf.image(chart_path, x=10, y=70, w=180)
-    
-    file_path = f"temp_report_{report.id}.pdf"
-    pdf.output(file_path)
-    return send_file(file_path, as_attachment=True)
+    # built in memory and cached per report version, nothing is written to disk
+    with metrics.stage('pdf'):
+        data = exports.report_pdf(report)
+    return send_file(BytesIO(data), mimetype='application/pdf',
+                     as_attachment=True, download_name=f"report_{report.id}.pdf")
 
-@app.route('/streamlit')
+@main.route('/download_reports')
+def download_reports():
+    # multi-report PDF: ?ids=1,2,3 or the user's most recent reports
+    if 'user' not in session:
+        return redirect(url_for('main.login'))
+    query = Report.query.filter_by(user_id=current_user_id())
+    ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip().isdigit()]
+    if ids:
+        query = query.filter(Report.id.in_(ids))
+    reports = query.order_by(Report.timestamp.desc()).limit(current_app.config['PDF_BATCH_MAX_REPORTS']).all()
+    with metrics.stage('pdf'):
+        data = exports.reports_pdf(reports)
+    return send_file(BytesIO(data), mimetype='application/pdf',
+                     as_attachment=True, download_name="reports.pdf")
+
+@main.route('/export/reports.csv')
+def export_reports_csv():
+    if 'user' not in session:
+        return redirect(url_for('main.login'))
+    # rows are fetched and written in chunks while the response streams
+    return Response(stream_with_context(exports.iter_csv(iter_user_reports(current_user_id()),
+                                                         chunk_rows=current_app.config['EXPORT_CHUNK_ROWS'])),
+                    mimetype='text/csv', headers={'Content-Disposition': 'attachment; filename=reports.csv'})
+
+def iter_user_reports(user_id):
+    # generator so the query runs inside the streaming response's context
+    columns = [getattr(Report, name) for name in exports.CSV_COLUMNS]
+    yield from db.session.execute(
+        db.select(*columns).filter_by(user_id=user_id).order_by(Report.timestamp.desc())
+        .execution_options(yield_per=current_app.config['EXPORT_CHUNK_ROWS']))
+
+@main.route('/streamlit')
 def open_streamlit():
     return redirect("http://localhost:8501", code=302)
  
+def init_services(app):
+    auth = AuthService(rounds=app.config['BCRYPT_LOG_ROUNDS'],
+                       workers=app.config['AUTH_WORKERS'],
+                       max_pending=app.config['AUTH_MAX_PENDING'])
+
+    #models are loaded on first use, reloaded when their pickle changes and, where
+    #supported, compiled to flat NumPy arrays (checked for exact parity with sklearn)
+    registry = ModelRegistry({name: spec['path'] for name, spec in MODEL_SPECS.items()},
+                             check_interval=app.config['MODEL_RELOAD_INTERVAL'],
+                             prepare=inference.compile_model)
+
+    #single-row (prediction, probability) pairs keyed on (model, version, rounded features)
+    prediction_cache = LRUCache(app.config['PREDICTION_CACHE_SIZE'])
+    registry.on_reload(lambda name, loaded: prediction_cache.clear())
+
+    #one batcher per model; concurrent requests share a single vectorized predict
+    batchers = {}
+    if app.config['PREDICTION_BATCHING']:
+        batchers = {name: MicroBatcher(batch_predictor(registry, name),
+                                       max_batch=app.config['BATCH_MAX_SIZE'],
+                                       max_wait=app.config['BATCH_MAX_WAIT_MS'] / 1000,
+                                       name=f'batcher-{name}')
+                    for name in MODEL_SPECS}
+
+    #charts are rendered in a background pool and served from an in-memory LRU
+    charts = ChartService(max_bytes=app.config['CHART_CACHE_BYTES'])
+    if app.config['CHART_WARM']:
+        charts.warm()
+
+    #write-behind mode groups reports from many requests into one commit
+    report_writer = None
+    if app.config['REPORT_WRITE_MODE'] != 'sync':
+        report_writer = ReportWriter(report_batch_writer(app),
+                                     max_batch=app.config['REPORT_WRITE_BATCH'],
+                                     max_delay=app.config['REPORT_WRITE_DELAY']).start()
+
+    #LLM client is created on the first chat request
+    chatbot = ChatService(make_chat_client,
+                          model=app.config['CHAT_MODEL'],
+                          timeout=app.config['CHAT_TIMEOUT'],
+                          max_concurrent=app.config['CHAT_MAX_CONCURRENT'])
+
+    app.extensions['mediinsight'] = Services(auth, registry, prediction_cache, batchers, charts,
+                                             report_writer, chatbot)
+    atexit.register(app.extensions['mediinsight'].stop)
+    metrics.register_collector('services', service_gauges)
+
+def service_gauges():
+    # gauges of the app serving /metrics
+    current = services()
+    cache = current.prediction_cache.stats()
+    gauges = [
+        ('mediinsight_prediction_cache_hits', "Prediction cache hits", cache['hits']),
+        ('mediinsight_prediction_cache_misses', "Prediction cache misses", cache['misses']),
+        ('mediinsight_prediction_cache_size', "Entries in the prediction cache", cache['size']),
+        ('mediinsight_auth_pending', "Password hash jobs running or queued", current.auth.pending()),
+    ]
+    for name, batcher in current.batchers.items():
+        gauges.append((f'mediinsight_batcher_{name}_queue_depth', f"Rows waiting in the {name} micro-batcher",
+                       batcher.stats()['queue_depth']))
+    if current.report_writer is not None:
+        gauges.append(('mediinsight_report_writer_pending', "Reports queued for a group commit",
+                       current.report_writer.pending()))
+        gauges.append(('mediinsight_report_writer_failed_rows', "Queued reports that could not be written",
+                       current.report_writer.rows_failed))
+    return gauges
+
+def create_app(config=None):
+    # cheap to call: heavy libraries and the models load on first use
+    app = Flask(__name__)
+    configure(app, config)
+    os.makedirs(os.path.dirname(database.DB_PATH), exist_ok=True)
+    db.init_app(app)
+    with app.app_context():
+        database.configure_engine(db.engine)
+        metrics.count_queries(db.engine)
+    metrics.init_app(app)
+    init_services(app)
+    app.register_blueprint(main)
+    if app.config['AUTO_MIGRATE']:
+        init_db(app)
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True,port=5050)
\ No newline at end of file
+    create_app().run(debug=True,port=5050)
\ No newline at end of file
@@ -0,0 +1,78 @@
+#Password hashing off the request thread, with backpressure and a configurable cost
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class AuthBusy(Exception):
+    """Raised when too many hash jobs are already queued."""
+
+
+def _encode(password):
+    # bcrypt only uses the first 72 bytes; newer releases reject longer input instead of truncating
+    return password.encode('utf-8')[:72]
+
+
+def hash_cost(hashed):
+    # "$2b$12$..." -> 12
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class AuthService:
+    """Runs bcrypt in a bounded thread pool (bcrypt releases the GIL while hashing).
+
+    At most `max_pending` hash jobs may be running or queued; beyond that
+    callers get AuthBusy right away rather than piling up behind the pool.
+    Hashes are made with `rounds`, and check_and_upgrade() rehashes stored
+    passwords whose cost differs, so the work factor can be changed at any time.
+    """
+
+    def __init__(self, rounds=12, workers=4, max_pending=64):
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise AuthBusy("Too many login attempts in progress, please retry")
+            self._pending += 1
+        try:
+            return self._pool.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def pending(self):
+        return self._pending
+
+    def stop(self):
+        self._pool.shutdown(wait=False)
+
+    def hash_password(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run(bcrypt.hashpw, _encode(password), salt).decode('utf-8')
+
+    def check_password(self, hashed, password):
+        try:
+            return self._run(bcrypt.checkpw, _encode(password), hashed.encode('utf-8'))
+        except ValueError:
+            # malformed stored hash
+            return False
+
+    def needs_rehash(self, hashed):
+        return hash_cost(hashed) != self.rounds
+
+    def check_and_upgrade(self, hashed, password):
+        # returns (matches, new hash or None); the new hash uses the current cost
+        if not self.check_password(hashed, password):
+            return False, None
+        if self.needs_rehash(hashed):
+            return True, self.hash_password(password)
+        return True, None
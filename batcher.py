@@ -0,0 +1,113 @@
+#Micro-batching of concurrent single-row predictions
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+#upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Collects rows submitted from many threads and scores them in one call.
+
+    A batch closes when `max_batch` rows are waiting or `max_wait` seconds
+    have passed since its first row. predict_batch(matrix) must return
+    (results, extra), where results has one entry per row; every caller gets
+    back (its own result, extra).
+    """
+
+    def __init__(self, predict_batch, max_batch=64, max_wait=0.002, name='batcher'):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.max_queue_depth = 0
+        self.size_histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        future = Future()
+        self._queue.put((row, future))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def predict(self, row, timeout=5):
+        return self.submit(row).result(timeout=timeout)
+
+    def stop(self, timeout=5):
+        # score the rows already queued, then let the thread exit
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _collect(self):
+        try:
+            items = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _record(self, size):
+        with self._lock:
+            self.batches += 1
+            self.rows += size
+            for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+                if size <= bound:
+                    self.size_histogram[i] += 1
+                    break
+            else:
+                self.size_histogram[-1] += 1
+
+    def _score(self, items):
+        results, extra = self.predict_batch(np.array([row for row, _ in items], dtype=float))
+        for (_, future), result in zip(items, results):
+            future.set_result((result, extra))
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            items = self._collect()
+            if not items:
+                continue
+            self._record(len(items))
+            try:
+                self._score(items)
+            except Exception:
+                # one bad row must not fail its neighbours: retry row by row
+                for item in items:
+                    try:
+                        self._score([item])
+                    except Exception as e:
+                        item[1].set_exception(e)
+
+    def stats(self):
+        with self._lock:
+            histogram = {f"le_{bound}": count for bound, count in zip(BATCH_SIZE_BUCKETS, self.size_histogram)}
+            histogram['le_inf'] = self.size_histogram[-1]
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': self.rows / self.batches if self.batches else 0,
+                'batch_size_histogram': histogram,
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000,
+            }
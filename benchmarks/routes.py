@@ -0,0 +1,311 @@
+#Route load benchmark: latency percentiles and throughput under concurrency, on a seeded scratch database
+#usage: python benchmarks/routes.py [--users 50] [--reports 20000] [--requests 200] [--concurrency 8]
+#                                   [--routes login,admin] [--server] [--json out.json] [--compare old.json]
+#results go to benchmarks/results/routes-<commit>.json unless --json is given
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+#password of every seeded user; one hash at the configured bcrypt cost is shared by all of them
+BENCH_PASSWORD = 'bench-password'
+#reports inserted per write_reports() call while seeding
+SEED_CHUNK_ROWS = 5000
+
+DEFAULT_ROUTES = ['login', 'predict_tumor', 'predict_diabetes', 'dashboard', 'admin', 'download_report']
+#not run unless named in --routes
+EXTRA_ROUTES = ['chat']
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def seed(mediinsight, app, users, reports, rng):
+    # synthetic users and reports spread over the last 90 days; returns the fixture the scenarios draw from
+    db, User, Report = mediinsight.db, mediinsight.User, mediinsight.Report
+    with app.app_context():
+        password = mediinsight.auth.hash_password(BENCH_PASSWORD)
+        db.session.execute(db.insert(User), [
+            {'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password': password, 'is_admin': False}
+            for i in range(users)
+        ])
+        db.session.commit()
+        people = db.session.execute(db.select(User.id, User.username)
+                                    .filter(User.username.like('bench%'))).all()
+        admin = db.session.execute(db.select(User.id, User.username).filter_by(username='admin')).one()
+
+        specs = list(mediinsight.MODEL_SPECS.values())
+        now = datetime.now()
+        for start in range(0, reports, SEED_CHUNK_ROWS):
+            rows = []
+            for _ in range(min(SEED_CHUNK_ROWS, reports - start)):
+                user_id, username = rng.choice(people)
+                spec = rng.choice(specs)
+                values = [round(rng.uniform(0, 100), 2) for _ in spec['features']]
+                probability = rng.random()
+                rows.append({
+                    'user': username,
+                    'user_id': user_id,
+                    'model_type': spec['model_type'],
+                    'input_data': mediinsight.format_input(spec['features'], values),
+                    'features': dict(zip(spec['features'], values)),
+                    'result': spec['labels'][probability > 0.5],
+                    'probability': probability,
+                    'timestamp': now - timedelta(minutes=rng.randrange(90 * 24 * 60)),
+                    'model_version': 'bench',
+                })
+            mediinsight.write_reports(rows)
+
+        owned = {}
+        for report_id, user_id in db.session.execute(db.select(Report.id, Report.user_id)):
+            owned.setdefault(user_id, []).append(report_id)
+    return {'users': [tuple(p) for p in people], 'admin': tuple(admin), 'reports': owned}
+
+
+def session_cookie(app, username, user_id):
+    # signed the same way Flask signs it, so seeded users need no bcrypt login per request
+    return app.session_interface.get_signing_serializer(app).dumps({'user': username, 'user_id': user_id})
+
+
+def scenarios(app, fixture):
+    # route name -> function(rng) returning one request: method, path, form/json body, cookie, expected status
+    users = fixture['users']
+    owners = [u for u in users if fixture['reports'].get(u[0])]
+    admin_cookie = session_cookie(app, fixture['admin'][1], fixture['admin'][0])
+
+    def as_user(rng, user=None):
+        user_id, username = user or rng.choice(users)
+        return session_cookie(app, username, user_id)
+
+    def login(rng):
+        return {'method': 'POST', 'path': '/login', 'expect': 302,
+                'form': {'username': rng.choice(users)[1], 'password': BENCH_PASSWORD}}
+
+    def predict_tumor(rng):
+        return {'method': 'POST', 'path': '/predict/tumor', 'expect': 200, 'cookie': as_user(rng),
+                'form': {'size': round(rng.uniform(1, 100), 2), 'growth_rate': round(rng.uniform(0, 10), 2),
+                         'roundness_score': round(rng.random(), 3)}}
+
+    def predict_diabetes(rng):
+        return {'method': 'POST', 'path': '/predict/diabetes', 'expect': 200, 'cookie': as_user(rng),
+                'form': {'preg': rng.randrange(0, 10), 'glucose': round(rng.uniform(70, 200), 1),
+                         'bmi': round(rng.uniform(18, 45), 1)}}
+
+    def dashboard(rng):
+        return {'method': 'GET', 'path': '/dashboard', 'expect': 200, 'cookie': as_user(rng)}
+
+    def admin(rng):
+        return {'method': 'GET', 'path': '/admin', 'expect': 200, 'cookie': admin_cookie}
+
+    def download_report(rng):
+        user = rng.choice(owners)
+        report_id = rng.choice(fixture['reports'][user[0]])
+        return {'method': 'GET', 'path': f'/download_report/{report_id}', 'expect': 200,
+                'cookie': as_user(rng, user)}
+
+    def chat(rng):
+        return {'method': 'POST', 'path': '/chat', 'expect': 200, 'cookie': as_user(rng),
+                'json': {'message': f"What does a glucose level of {rng.randrange(70, 200)} mean?"}}
+
+    return {'login': login, 'predict_tumor': predict_tumor, 'predict_diabetes': predict_diabetes,
+            'dashboard': dashboard, 'admin': admin, 'download_report': download_report, 'chat': chat}
+
+
+class ClientDriver:
+    """Sends requests through a Flask test client, one per worker thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, req):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        if req.get('cookie'):
+            client.set_cookie('session', req['cookie'])
+        else:
+            client.delete_cookie('session')
+        start = time.perf_counter()
+        response = client.open(req['path'], method=req['method'], data=req.get('form'), json=req.get('json'))
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        return response.status_code, elapsed
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """Sends real HTTP requests to the app on a local threaded WSGI server."""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no access log line per request
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def send(self, req):
+        headers = {}
+        body = None
+        if req.get('cookie'):
+            headers['Cookie'] = f"session={req['cookie']}"
+        if req.get('form') is not None:
+            body = urlencode(req['form'])
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif req.get('json') is not None:
+            body = json.dumps(req['json'])
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            conn.request(req['method'], req['path'], body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        finally:
+            conn.close()
+        return response.status, time.perf_counter() - start
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(sorted_values, q):
+    # nearest-rank percentile
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))]
+
+
+def run_route(driver, make_request, rng, requests, concurrency, warmup):
+    for _ in range(warmup):
+        driver.send(make_request(rng))
+    batch = [make_request(rng) for _ in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(driver.send, batch))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed * 1000 for _, elapsed in results)
+    errors = sum(1 for (status, _), req in zip(results, batch) if status != req['expect'])
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'rps': requests / wall,
+        'mean_ms': sum(latencies) / len(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1],
+    }
+
+
+def print_results(results, baseline=None):
+    print(f"{'route':<18}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for route, r in results.items():
+        line = f"{route:<18}{r['rps']:>9.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}"
+        old = (baseline or {}).get(route)
+        if old:
+            line += (f"   rps {(r['rps'] / old['rps'] - 1) * 100:+.0f}%"
+                     f"  p95 {(r['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the Flask routes")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--reports', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=200, help="measured requests per route")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=5, help="unmeasured requests per route")
+    parser.add_argument('--routes', default=','.join(DEFAULT_ROUTES),
+                        help=f"comma-separated, from {', '.join(DEFAULT_ROUTES + EXTRA_ROUTES)}")
+    parser.add_argument('--server', action='store_true', help="real HTTP on a local WSGI server, not the test client")
+    parser.add_argument('--bcrypt-rounds', type=int, help="bcrypt cost for seeded users (default: app setting)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="where to save the results")
+    parser.add_argument('--compare', help="earlier results file to show changes against")
+    args = parser.parse_args(argv)
+
+    routes = [r.strip() for r in args.routes.split(',') if r.strip()]
+    unknown = set(routes) - set(DEFAULT_ROUTES + EXTRA_ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        # the scratch database and the chat stub must be in place before the app is imported
+        os.environ['MEDIINSIGHT_DB'] = os.path.join(tmp, 'bench.db')
+        import chat_stub
+        stub = chat_stub.serve(0)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        os.environ['CHAT_BASE_URL'] = f"http://127.0.0.1:{stub.server_address[1]}"
+
+        import app as mediinsight
+        config = {} if args.bcrypt_rounds is None else {'BCRYPT_LOG_ROUNDS': args.bcrypt_rounds}
+        app = mediinsight.create_app(config)
+
+        started = time.perf_counter()
+        fixture = seed(mediinsight, app, args.users, args.reports, rng)
+        print(f"seeded {args.users} users and {args.reports} reports in {time.perf_counter() - started:.1f}s")
+
+        driver = ServerDriver(app) if args.server else ClientDriver(app)
+        makers = scenarios(app, fixture)
+        results = {}
+        try:
+            for route in routes:
+                results[route] = run_route(driver, makers[route], rng, args.requests, args.concurrency, args.warmup)
+        finally:
+            driver.close()
+            stub.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    commit = git_commit()
+    output = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'settings': {
+            'users': args.users, 'reports': args.reports, 'requests': args.requests,
+            'concurrency': args.concurrency, 'warmup': args.warmup, 'server': args.server,
+            'bcrypt_rounds': app.config['BCRYPT_LOG_ROUNDS'], 'seed': args.seed,
+        },
+        'results': results,
+    }
+    path = args.json or os.path.join(ROOT, 'benchmarks', 'results', f'routes-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"results saved to {path}")
+    return 1 if any(r['errors'] for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
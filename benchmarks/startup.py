@@ -0,0 +1,110 @@
+#Startup benchmark: import and create_app() time in fresh interpreters, with a -X importtime breakdown
+#usage: python benchmarks/startup.py [--runs 5] [--max-ms 800] [--json results.json]
+#exits 1 when a heavy library is imported at startup or the median exceeds --max-ms
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#libraries that must only be imported on first use, never by create_app()
+LAZY_MODULES = ['matplotlib', 'fpdf', 'huggingface_hub', 'scipy', 'sklearn', 'joblib', 'pandas']
+
+#runs in the child interpreter; chart warming is off so no background import races the check
+CHILD = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app({{'CHART_WARM': False}})
+t2 = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'eager_modules': [m for m in {LAZY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def parse_importtime(stderr, root='app'):
+    # {module: cumulative us} for the modules `root` imports directly; importtime
+    # prints children before their parent, one indentation level deeper
+    modules, children = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == root:
+                modules = children
+            children = {}
+        elif depth == 1:
+            children[name.strip()] = int(cumulative_us)
+    return modules
+
+
+def run_once(env):
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['modules'] = parse_importtime(proc.stderr)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="slowest imports to list")
+    parser.add_argument('--max-ms', type=float, help="fail when median import + create_app exceeds this")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, MEDIINSIGHT_DB=os.path.join(tmp, 'startup.db'))
+        first = run_once(env)  # creates and migrates the scratch database, and warms the bytecode cache
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    totals = [r['import_ms'] + r['create_app_ms'] for r in runs]
+    # direct imports of app.py, by median cumulative time across runs
+    slowest = sorted(((statistics.median(r['modules'].get(name, 0) for r in runs) / 1000, name)
+                      for name in runs[0]['modules']), reverse=True)[:args.top]
+    eager = sorted({m for r in runs for m in r['eager_modules']})
+    results = {
+        'runs': args.runs,
+        'first_run_ms': first['import_ms'] + first['create_app_ms'],
+        'import_ms': statistics.median(r['import_ms'] for r in runs),
+        'create_app_ms': statistics.median(r['create_app_ms'] for r in runs),
+        'total_ms': {'median': statistics.median(totals), 'min': min(totals), 'max': max(totals)},
+        'slowest_imports_ms': {name: round(ms, 1) for ms, name in slowest},
+        'eager_modules': eager,
+    }
+
+    print(f"first run (migrates a new database): {results['first_run_ms']:.0f} ms")
+    print(f"import app: {results['import_ms']:.0f} ms, create_app(): {results['create_app_ms']:.0f} ms "
+          f"(median of {args.runs})")
+    print(f"total: median {results['total_ms']['median']:.0f} ms, "
+          f"min {results['total_ms']['min']:.0f}, max {results['total_ms']['max']:.0f}")
+    print("slowest imports of app.py (cumulative ms, inflated by -X importtime):")
+    for name, ms in results['slowest_imports_ms'].items():
+        print(f"  {ms:8.1f}  {name}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup, should be lazy: {', '.join(eager)}")
+        failed = True
+    if args.max_ms is not None and results['total_ms']['median'] > args.max_ms:
+        print(f"FAIL: median startup {results['total_ms']['median']:.0f} ms exceeds {args.max_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#Chart rendering and in-memory, content-addressed PNG cache
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import metrics
+from caching import BytesLRU
+
+#title, axis label, bar labels and colours for each model's result chart
+PREDICTION_CHARTS = {
+    'tumor': {
+        'title': 'Tumor Prediction Result',
+        'ylabel': 'Probability',
+        'bars': ['Benign', 'Malignant'],
+        'colors': ['green', 'red'],
+    },
+    'diabetes': {
+        'title': "Diabetes Prediction Result",
+        'ylabel': "Prediction Score",
+        'bars': ['Non-diabetic', 'Diabetic'],
+        'colors': ['green', 'red'],
+    },
+}
+
+#result series drawn on the dashboard comparison chart
+COMPARISON_SERIES = [
+    ('Benign Tumor', 'green'),
+    ('Malignant Tumor', 'red'),
+    ('Diabetic', 'orange'),
+    ('Non-Diabetic', 'blue'),
+]
+
+
+def _figure():
+    # matplotlib is imported on the first render, not when the app starts
+    from matplotlib.figure import Figure
+    return Figure()
+
+
+def _png(fig):
+    buf = BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def render_prediction_chart(model, probability):
+    # object-oriented Figure API: no global pyplot state, safe to call from worker threads
+    style = PREDICTION_CHARTS[model]
+    fig = _figure()
+    ax = fig.subplots()
+    ax.bar(style['bars'], [1 - probability, probability], color=style['colors'])
+    ax.set_title(style['title'])
+    ax.set_ylabel(style['ylabel'])
+    ax.set_ylim(0, 1)
+    fig.tight_layout()
+    return _png(fig)
+
+
+def render_comparison_chart(model_counts):
+    # model_counts: ((model label, (count per COMPARISON_SERIES entry)), ...)
+    fig = _figure()
+    ax = fig.subplots()
+    x = range(len(model_counts))
+    for offset, (series, color) in enumerate(COMPARISON_SERIES):
+        ax.bar([i + 0.2 * offset for i in x], [counts[offset] for _, counts in model_counts],
+               width=0.2, label=series, color=color)
+    ax.set_xticks([i + 0.3 for i in x])
+    ax.set_xticklabels([label for label, _ in model_counts])
+    ax.set_ylabel("Number of Predictions")
+    ax.set_title("Prediction Result Comparison")
+    ax.legend()
+    fig.tight_layout()
+    return _png(fig)
+
+
+def render_usage_chart(type_counts):
+    fig = _figure()
+    ax = fig.subplots()
+    ax.bar([t for t, _ in type_counts], [n for _, n in type_counts], color='skyblue')
+    ax.set_title("Your Prediction Usage")
+    ax.set_ylabel("Number of Predictions")
+    return _png(fig)
+
+
+RENDERERS = {
+    'prediction': render_prediction_chart,
+    'comparison': render_comparison_chart,
+    'usage': render_usage_chart,
+}
+
+
+def chart_key(kind, *args):
+    # content hash of a chart's kind and inputs
+    return hashlib.sha256(repr((kind, args)).encode()).hexdigest()[:20]
+
+
+class ChartService:
+    """Hands out content-addressed chart ids and renders them in a background pool.
+
+    A chart id is a hash of the chart kind and its inputs, so the same data
+    always maps to the same URL; browsers can cache it forever and the server
+    keeps the PNG in a byte-capped LRU. An id is only known to the process
+    that handed it out, so chart URLs carry the inputs (or the view rebuilds
+    them) and any worker can serve them.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_specs=10000, max_workers=2, buckets=20):
+        self.buckets = buckets
+        self.max_specs = max_specs
+        self.cache = BytesLRU(max_bytes)
+        self._specs = OrderedDict()
+        self._pending = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chart')
+        self._lock = threading.RLock()
+
+    def chart_id(self, kind, *args):
+        # register the chart and schedule its render; returns without waiting
+        chart_id = chart_key(kind, *args)
+        with self._lock:
+            self._specs[chart_id] = (kind, args)
+            self._specs.move_to_end(chart_id)
+            while len(self._specs) > self.max_specs:
+                self._specs.popitem(last=False)
+            self._schedule(chart_id, kind, args)
+        return chart_id
+
+    def bucket(self, probability):
+        # probabilities are bucketed so only a few distinct result charts exist
+        return int(round(probability * self.buckets)) / self.buckets
+
+    def prediction(self, model, probability):
+        return self.chart_id('prediction', model, self.bucket(probability))
+
+    def _schedule(self, chart_id, kind, args):
+        if chart_id in self.cache or chart_id in self._pending:
+            return
+        future = self._pool.submit(self._render, kind, args)
+        self._pending[chart_id] = future
+        future.add_done_callback(lambda f: self._finish(chart_id, f))
+
+    @staticmethod
+    def _render(kind, args):
+        with metrics.stage('chart'):
+            return RENDERERS[kind](*args)
+
+    def _finish(self, chart_id, future):
+        # renders cancelled by stop() have no result, and exception() would raise
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(chart_id, future.result())
+        with self._lock:
+            if self._pending.get(chart_id) is future:
+                del self._pending[chart_id]
+
+    def png(self, chart_id, timeout=10):
+        png = self.cache.get(chart_id)
+        if png is not None:
+            return png
+        with self._lock:
+            future = self._pending.get(chart_id)
+            if future is None:
+                spec = self._specs.get(chart_id)
+                if spec is None:
+                    raise KeyError(chart_id)
+                self._schedule(chart_id, *spec)
+                future = self._pending.get(chart_id)
+        if future is None:
+            return self.cache.get(chart_id)
+        return future.result(timeout=timeout)
+
+    def stop(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self):
+        # pre-render the hard 0/1 outcome charts so the first predictions hit the cache
+        for model in PREDICTION_CHARTS:
+            for outcome in (0, 1):
+                self.prediction(model, float(outcome))
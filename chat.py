@@ -0,0 +1,82 @@
+#Chatbot client with streaming, timeouts, a concurrency cap and a response cache
+import threading
+
+from caching import TTLCache
+
+
+class ChatBusy(Exception):
+    """Raised when every chat slot is in use for longer than the queue timeout."""
+
+
+def normalize_prompt(message):
+    # case and whitespace differences should still hit the cache
+    return " ".join(message.lower().split())
+
+
+class ChatService:
+    """Wraps the LLM client used by /chat.
+
+    At most `max_concurrent` provider calls run at once; callers wait up to
+    `queue_timeout` seconds for a slot and then get ChatBusy instead of tying
+    up a worker. Each call is bounded by `timeout`. Replies are cached by
+    normalized prompt for `cache_ttl` seconds.
+    """
+
+    def __init__(self, client_factory, model, timeout=30, max_concurrent=4, queue_timeout=2,
+                 cache_ttl=3600, cache_size=1024):
+        self.client_factory = client_factory
+        self.model = model
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # created on first use, so importing the app never touches the provider
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.client_factory(self.timeout)
+        return self._client
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ChatBusy("Chat service is busy, please try again shortly")
+
+    def release(self):
+        self._slots.release()
+
+    def cached(self, message):
+        return self.cache.get(normalize_prompt(message))
+
+    def _messages(self, message):
+        return [{"role": "user", "content": message}]
+
+    def complete(self, message):
+        reply = self.cached(message)
+        if reply is not None:
+            return reply
+        self.acquire()
+        try:
+            completion = self.client.chat.completions.create(model=self.model, messages=self._messages(message))
+        finally:
+            self.release()
+        reply = completion.choices[0].message.content
+        self.cache.put(normalize_prompt(message), reply)
+        return reply
+
+    def stream(self, message):
+        # yields text deltas as they arrive; the caller holds a slot (acquire/release)
+        parts = []
+        for chunk in self.client.chat.completions.create(model=self.model, messages=self._messages(message),
+                                                         stream=True):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        self.cache.put(normalize_prompt(message), "".join(parts))
@@ -0,0 +1,62 @@
+#Local OpenAI-compatible chat server for testing /chat without the real provider
+#usage: python chat_stub.py [port]  then  CHAT_BASE_URL=http://127.0.0.1:8088 python app.py
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#seconds between streamed tokens, to mimic a real model
+TOKEN_DELAY = 0.02
+
+
+def reply_for(messages):
+    return f"Stub reply to: {messages[-1]['content']}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        reply = reply_for(body.get('messages') or [{'content': ''}])
+        model = body.get('model', 'stub')
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for token in reply.split(' '):
+                chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                         'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': token + ' '},
+                                      'finish_reason': None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(TOKEN_DELAY)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+            return
+        data = json.dumps({
+            'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8088):
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8088
+    print(f"Chat stub listening on http://127.0.0.1:{port}")
+    serve(port).serve_forever()
@@ -0,0 +1,94 @@
+#Incremental report loading for the Streamlit dashboard
+import threading
+import time
+
+import pandas as pd
+
+import database
+
+REPORT_COLUMNS = ['id', 'user', 'model_type', 'input_data', 'result', 'probability', 'timestamp', 'model_version']
+#low-cardinality text columns held as pandas categoricals
+CATEGORICAL_COLUMNS = ['user', 'model_type', 'result', 'model_version']
+
+
+def report_filters(user=None, model_type=None, result=None):
+    # parameterized WHERE clause for the dashboard filters; None means no filter
+    clauses, params = [], []
+    if user is not None:
+        clauses.append("user_id = (SELECT id FROM user WHERE username = ?)")
+        params.append(user)
+    if model_type is not None:
+        clauses.append("model_type = ?")
+        params.append(model_type)
+    if result is not None:
+        clauses.append("result = ?")
+        params.append(result)
+    return clauses, params
+
+
+def report_source(conn, columns, include_archive=False):
+    # FROM target for report queries: the live table, or live plus archived reports
+    # (a report caught mid-move by retention.py is in both files with identical columns and counted once)
+    if not include_archive or not database.attach_archive(conn):
+        return 'report'
+    selected = ", ".join(dict.fromkeys(list(columns) + ['user_id']))
+    return (f"(SELECT {selected} FROM main.report UNION ALL "
+            f"SELECT {selected} FROM archive.report a "
+            f"WHERE NOT EXISTS (SELECT 1 FROM main.report m WHERE m.id = a.id "
+            f"AND m.timestamp IS a.timestamp AND m.user_id IS a.user_id))")
+
+
+def as_categoricals(df):
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def append_categoricals(df, new_rows):
+    # extend each column's categories with the new values only, so the cached rows keep
+    # their codes and appending costs O(new rows) rather than re-encoding the whole frame
+    for column in CATEGORICAL_COLUMNS:
+        added = pd.Index(new_rows[column].dropna().unique()).difference(df[column].cat.categories)
+        if len(added):
+            df[column] = df[column].cat.add_categories(added)
+        new_rows[column] = pd.Categorical(new_rows[column], categories=df[column].cat.categories)
+    return pd.concat([df, new_rows], ignore_index=True)
+
+
+class ReportFrame:
+    """Reports matching one filter combination, kept up to date by id high-water mark.
+
+    The first call loads the matching rows; later calls only fetch rows with
+    a larger id. Every `ttl` seconds the frame is reloaded in full so deleted
+    reports disappear as well. With include_archive, reports moved to the
+    archive database by retention.py are included.
+    """
+
+    def __init__(self, clauses, params, ttl=300, include_archive=False):
+        self.clauses = clauses
+        self.params = params
+        self.ttl = ttl
+        self.include_archive = include_archive
+        self.df = None
+        self.last_id = 0
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _query(self, conn, after_id):
+        clauses = self.clauses + ["id > ?"]
+        source = report_source(conn, REPORT_COLUMNS, self.include_archive)
+        sql = f"SELECT {', '.join(REPORT_COLUMNS)} FROM {source} WHERE {' AND '.join(clauses)} ORDER BY id"
+        return pd.read_sql_query(sql, conn, params=self.params + [after_id], parse_dates=['timestamp'])
+
+    def get(self, conn):
+        with self._lock:
+            if self.df is None or time.monotonic() - self.loaded_at > self.ttl:
+                self.df = as_categoricals(self._query(conn, 0))
+                self.loaded_at = time.monotonic()
+            else:
+                new_rows = self._query(conn, self.last_id)
+                if not new_rows.empty:
+                    self.df = append_categoricals(self.df, new_rows)
+            if not self.df.empty:
+                self.last_id = int(self.df['id'].iloc[-1])
+            return self.df
@@ -0,0 +1,95 @@
+#Shared SQLite settings and connection pool for the Flask app and Streamlit dashboard
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+#MEDIINSIGHT_DB points the app and dashboard at another database file (benchmarks, tests)
+DB_PATH = os.environ.get('MEDIINSIGHT_DB',
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'users.db'))
+DATABASE_URI = f'sqlite:///{DB_PATH}'
+#reports moved out of the live table by retention.py; MEDIINSIGHT_ARCHIVE_DB overrides the location
+ARCHIVE_PATH = os.environ.get('MEDIINSIGHT_ARCHIVE_DB', os.path.join(os.path.dirname(DB_PATH), 'reports_archive.db'))
+
+#applied to every new connection: WAL lets dashboard reads run alongside prediction
+#writes, NORMAL sync is safe under WAL, and busy_timeout waits instead of failing
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+#SQLAlchemy pool for the Flask app (SQLALCHEMY_ENGINE_OPTIONS)
+ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 10,
+}
+
+
+def apply_pragmas(conn):
+    cursor = conn.cursor()
+    for name, value in PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def configure_engine(engine):
+    # run the pragmas on each connection SQLAlchemy opens
+    event.listen(engine, 'connect', lambda dbapi_conn, record: apply_pragmas(dbapi_conn))
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    apply_pragmas(conn)
+    return conn
+
+
+def attach_archive(conn, path=ARCHIVE_PATH, create=False):
+    # attaches the archive as schema "archive" once per connection; False if it does not exist yet
+    if any(row[1] == 'archive' for row in conn.execute('PRAGMA database_list')):
+        return True
+    if not create and not os.path.exists(path):
+        return False
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    return True
+
+
+class ConnectionPool:
+    """Fixed set of reusable sqlite3 connections for code outside SQLAlchemy."""
+
+    def __init__(self, path=DB_PATH, size=4, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._idle.put(None)
+
+    @contextmanager
+    def connection(self):
+        # connections are opened on first use and handed back after each block;
+        # a failed open gives the slot back empty, so the next caller retries
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no free database connection after {self.timeout}s") from None
+        try:
+            if conn is None:
+                conn = connect(self.path)
+            yield conn
+            conn.commit()
+        except Exception:
+            if conn is not None:
+                conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is not None:
+                conn.close()
@@ -0,0 +1,139 @@
+#CSV and PDF exports built in memory, without temp files
+import csv
+import sys
+from io import StringIO
+
+from caching import BytesLRU
+
+CSV_COLUMNS = ['id', 'timestamp', 'user', 'model_type', 'input_data', 'result', 'probability', 'model_version']
+
+#labels drawn as result bars in the PDF, by report model type
+RESULT_BARS = {
+    'Tumor Prediction': ('Benign Tumor', 'Malignant Tumor'),
+    'Diabetes Prediction': ('Non-Diabetic', 'Diabetic'),
+}
+
+#rendered single-report PDFs, keyed on report id plus owner, timestamp and model version
+#(SQLite can hand a deleted report's id to a new report, so the id alone is not unique)
+pdf_cache = BytesLRU(max_bytes=16 * 1024 * 1024)
+
+
+def _missing(value):
+    # pandas marks missing values as NaN/NaT/NA; rows can only come from pandas once it is loaded
+    pd = sys.modules.get('pandas')
+    return pd is not None and pd.api.types.is_scalar(value) and bool(pd.isna(value))
+
+
+def _field(report, name):
+    # works for ORM objects, dicts, pandas rows and itertuples() tuples; missing values are None
+    if isinstance(report, dict):
+        value = report.get(name)
+    else:
+        try:
+            value = report[name]
+        except (KeyError, TypeError, IndexError):
+            value = getattr(report, name, None)
+    return None if _missing(value) else value
+
+
+def iter_csv(rows, columns=CSV_COLUMNS, chunk_rows=1000):
+    # yields the CSV text in chunks of chunk_rows lines, never the whole file
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_field(row, column) for column in columns])
+        if count % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _new_pdf():
+    # fpdf is imported on the first export, not when the app starts
+    from fpdf import FPDF
+    return FPDF()
+
+
+def _pdf_bytes(pdf):
+    # PyFPDF returns a latin-1 str for dest='S', fpdf2 returns a bytearray
+    out = pdf.output(dest='S')
+    return out.encode('latin-1') if isinstance(out, str) else bytes(out)
+
+
+def _draw_result_bars(pdf, report, y):
+    # vector bar chart of the result, so no PNG has to be written for FPDF to read;
+    # uses the stored probability, or the label alone for reports saved without one
+    labels = RESULT_BARS.get(_field(report, 'model_type'))
+    if not labels or _field(report, 'result') not in labels:
+        return
+    positive = _field(report, 'probability')
+    if positive is None:
+        positive = labels.index(_field(report, 'result'))
+    values = (1 - positive, positive)
+    colors = ((40, 167, 69), (220, 53, 69))
+    height = 60
+    pdf.set_draw_color(0, 0, 0)
+    pdf.line(20, y + height, 120, y + height)
+    for i, (label, value, color) in enumerate(zip(labels, values, colors)):
+        x = 30 + i * 50
+        if value:
+            pdf.set_fill_color(*color)
+            pdf.rect(x, y + height * (1 - value), 30, height * value, style='F')
+        pdf.text(x, y + height + 6, label)
+
+
+def _probability_text(report):
+    probability = _field(report, 'probability')
+    return "" if probability is None else f" (probability {probability:.1%})"
+
+
+def _add_report_page(pdf, report):
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"MediInsight Report", ln=1, align='C')
+    pdf.cell(200, 10, txt=f"Date: {_field(report, 'timestamp'):%Y-%m-%d %H:%M}", ln=2)
+    pdf.cell(200, 10, txt=f"Model Type: {_field(report, 'model_type')}", ln=3)
+    pdf.cell(200, 10, txt=f"Input Data: {_field(report, 'input_data')}", ln=4)
+    pdf.cell(200, 10, txt=f"Result: {_field(report, 'result')}{_probability_text(report)}", ln=5)
+    _draw_result_bars(pdf, report, 70)
+
+
+def _pdf_key(report):
+    return tuple(_field(report, name) for name in ('id', 'user_id', 'timestamp', 'model_version'))
+
+
+def report_pdf(report):
+    key = _pdf_key(report)
+    data = pdf_cache.get(key)
+    if data is None:
+        pdf = _new_pdf()
+        _add_report_page(pdf, report)
+        data = _pdf_bytes(pdf)
+        pdf_cache.put(key, data)
+    return data
+
+
+def forget_report(report):
+    # drop the cached PDF of a deleted report
+    pdf_cache.discard(_pdf_key(report))
+
+
+def reports_pdf(reports):
+    # one page per report in a single document
+    pdf = _new_pdf()
+    for report in reports:
+        _add_report_page(pdf, report)
+    return _pdf_bytes(pdf)
+
+
+def summary_pdf(reports):
+    # one line per report, as in the Streamlit export
+    pdf = _new_pdf()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    for report in reports:
+        pdf.cell(200, 10, txt=f"{_field(report, 'timestamp')} | {_field(report, 'model_type')} | "
+                              f"{_field(report, 'result')}{_probability_text(report)}", ln=True)
+    return _pdf_bytes(pdf)
@@ -0,0 +1,118 @@
+#Low-overhead inference for the pickled sklearn models
+#usage: python inference.py [rows]  - parity check of every models/*.pkl against sklearn
+import glob
+import os
+import sys
+import warnings
+
+import numpy as np
+
+#rows of random input used to check a compiled model against its estimator
+PARITY_ROWS = 256
+
+
+class LinearBinaryClassifier:
+    """Binary linear classifier evaluated straight from flat coefficient arrays.
+
+    Mirrors sklearn's decision_function / predict / predict_proba for a fitted
+    binary LogisticRegression, including the (n, k) @ (k, 1) product shape, so
+    results are bit-for-bit identical but skip sklearn's per-call validation.
+    """
+
+    def __init__(self, coef, intercept, classes):
+        self.coef_T = np.array(coef, dtype=np.float64).T.copy()
+        self.intercept = np.array(intercept, dtype=np.float64)
+        self.classes_ = np.array(classes)
+        self.n_features = self.coef_T.shape[0]
+        # scipy is only needed once a model is compiled, not at import
+        from scipy.special import expit
+        self._expit = expit
+
+    def _check(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features per row, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("input contains NaN or infinity")
+        return X
+
+    def decision_function(self, X):
+        scores = self._check(X) @ self.coef_T + self.intercept
+        return scores.reshape(-1)
+
+    def predict(self, X):
+        return self.classes_.take((self.decision_function(X) > 0).astype(np.intp), axis=0)
+
+    def predict_proba(self, X):
+        prob = self._expit(self.decision_function(X))
+        return np.stack([1 - prob, prob], axis=1)
+
+
+def export(estimator):
+    # flat-array engine for supported estimators, None for everything else
+    coef = getattr(estimator, 'coef_', None)
+    classes = getattr(estimator, 'classes_', None)
+    if type(estimator).__name__ != 'LogisticRegression' or coef is None or classes is None:
+        return None
+    if len(classes) != 2 or np.ndim(coef) != 2 or coef.shape[0] != 1:
+        return None
+    return LinearBinaryClassifier(coef, estimator.intercept_, classes)
+
+
+def probe_inputs(n_features, rows=PARITY_ROWS, seed=0):
+    # wide spread of magnitudes so both classes and saturated probabilities are covered
+    rng = np.random.default_rng(seed)
+    scale = 10.0 ** rng.integers(-2, 3, size=(rows, 1))
+    return rng.normal(size=(rows, n_features)) * scale + rng.uniform(0, 200, size=(rows, n_features))
+
+
+def check_parity(estimator, engine, X):
+    # list of mismatch descriptions; empty means identical results
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # feature-name warnings for plain arrays
+        expected_pred = estimator.predict(X)
+        expected_proba = estimator.predict_proba(X)
+        single = [estimator.predict_proba(X[i:i + 1]) for i in range(min(len(X), 16))]
+    problems = []
+    if not np.array_equal(engine.predict(X), expected_pred):
+        problems.append("predict differs")
+    if not np.array_equal(engine.predict_proba(X), expected_proba):
+        problems.append("predict_proba differs")
+    if any(not np.array_equal(engine.predict_proba(X[i:i + 1]), p) for i, p in enumerate(single)):
+        problems.append("single-row predict_proba differs")
+    return problems
+
+
+def compile_model(estimator, rows=PARITY_ROWS):
+    # compiled engine when it matches sklearn exactly, otherwise the estimator itself
+    engine = export(estimator)
+    if engine is None:
+        return estimator
+    problems = check_parity(estimator, engine, probe_inputs(engine.n_features, rows))
+    if problems:
+        warnings.warn(f"compiled {type(estimator).__name__} disagrees with sklearn ({', '.join(problems)}); "
+                      f"using the estimator")
+        return estimator
+    return engine
+
+
+def main(rows=10000):
+    import joblib
+
+    failed = False
+    from model_registry import MODEL_DIR
+
+    for path in sorted(glob.glob(os.path.join(MODEL_DIR, '*.pkl'))):
+        estimator = joblib.load(path)
+        engine = export(estimator)
+        if engine is None:
+            print(f"{path}: {type(estimator).__name__} not supported, falls back to the estimator")
+            continue
+        problems = check_parity(estimator, engine, probe_inputs(engine.n_features, rows, seed=1))
+        failed |= bool(problems)
+        print(f"{path}: {'; '.join(problems) if problems else f'identical on {rows} rows'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
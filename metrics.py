@@ -0,0 +1,198 @@
+#Request and stage timings, per-request DB query counts, Prometheus text output and slow-request profiling
+import cProfile
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import request
+from sqlalchemy import event
+
+#stages timed with stage(); chart renders are timed on the chart pool threads
+STAGES = ('inference', 'chart', 'db_commit', 'pdf', 'llm')
+
+#histogram bucket upper bounds
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+#state of the request running in the current context: start time, query count, profiler
+_request = ContextVar('mediinsight_request', default=None)
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                label_text = _labels(self.labels, labels)
+                lines.append(f"{self.name}{{{label_text}}} {value}" if label_text else f"{self.name} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def declare(self, *labels):
+        # series that should be exported with zero counts before the first observation
+        with self._lock:
+            self._series.setdefault(labels, [0] * (len(self.buckets) + 2))
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                prefix = _labels(self.labels, labels)
+                prefix = prefix + "," if prefix else ""
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), series):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                suffix = f"{{{prefix.rstrip(',')}}}" if prefix else ""
+                lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+                lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram('mediinsight_stage_seconds', "Time spent in an instrumented stage", ('stage',))
+request_seconds = Histogram('mediinsight_request_seconds', "Request handling time, until the response is returned",
+                            ('endpoint', 'method'))
+request_queries = Histogram('mediinsight_request_db_queries', "SQL statements executed per request", ('endpoint',),
+                            buckets=QUERY_BUCKETS)
+requests_total = Counter('mediinsight_requests_total', "Requests handled", ('endpoint', 'method', 'status'))
+queries_total = Counter('mediinsight_db_queries_total', "SQL statements executed, in and outside requests")
+profiles_total = Counter('mediinsight_profiles_written_total', "cProfile dumps written for slow requests")
+
+for _stage in STAGES:
+    stage_seconds.declare(_stage)
+
+METRICS = [stage_seconds, request_seconds, request_queries, requests_total, queries_total, profiles_total]
+
+#extra gauges: name -> callable returning [(metric, help, value), ...], e.g. cache and queue sizes
+_collectors = {}
+
+#one request profiled at a time; cProfile cannot run two profilers at once on newer Pythons
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, name)
+
+
+def register_collector(name, collect):
+    # keyed by name, so creating the app again replaces rather than duplicates a collector
+    _collectors[name] = collect
+
+
+def count_queries(engine):
+    # every statement is counted; the ones run while serving a request also count towards it
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries_total.inc()
+        state = _request.get()
+        if state is not None:
+            state['queries'] += 1
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collect in list(_collectors.values()):
+        for name, help, value in collect():
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
+
+
+def _profile_path(directory, endpoint, elapsed):
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{safe}_{elapsed * 1000:.0f}ms.prof")
+
+
+def init_app(app):
+    """Times every request and, when PROFILE_SLOW_MS is set, profiles requests.
+
+    Profiled requests slower than PROFILE_SLOW_MS are dumped to PROFILE_DIR as
+    .prof files (open with `python -m pstats` or snakeviz).
+    """
+    @app.before_request
+    def start_request():
+        state = {'start': time.perf_counter(), 'queries': 0, 'profiler': None}
+        if app.config.get('PROFILE_SLOW_MS') is not None and _profile_lock.acquire(blocking=False):
+            state['profiler'] = cProfile.Profile()
+            state['profiler'].enable()
+        _request.set(state)
+
+    @app.after_request
+    def finish_request(response):
+        state = _request.get()
+        if state is None:
+            return response
+        _request.set(None)
+        elapsed = time.perf_counter() - state['start']
+        endpoint = request.endpoint or 'unmatched'
+        request_seconds.observe(elapsed, endpoint, request.method)
+        request_queries.observe(state['queries'], endpoint)
+        requests_total.inc(endpoint, request.method, str(response.status_code))
+
+        profiler = state['profiler']
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            if elapsed * 1000 >= app.config['PROFILE_SLOW_MS']:
+                os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+                path = _profile_path(app.config['PROFILE_DIR'], endpoint, elapsed)
+                profiler.dump_stats(path)
+                profiles_total.inc()
+                app.logger.warning("Slow request %s %s took %.0f ms, profile written to %s",
+                                   request.method, request.path, elapsed * 1000, path)
+        return response
+
+    @app.teardown_request
+    def abandon_request(exc):
+        # after_request is skipped when a view raises; stop the profiler so the lock is freed
+        state = _request.get()
+        if state is not None and state['profiler'] is not None:
+            state['profiler'].disable()
+            _profile_lock.release()
+        _request.set(None)
@@ -0,0 +1,134 @@
+#Lightweight schema upgrades for existing SQLite databases
+import json
+
+from sqlalchemy import inspect, text
+
+#columns added after the tables were first created: (table, column, SQL type)
+ADDED_COLUMNS = [
+    ('report', 'model_version', 'VARCHAR(64)'),
+    ('report', 'user_id', 'INTEGER REFERENCES user (id)'),
+    ('report', 'features', 'JSON'),
+    ('report', 'probability', 'FLOAT'),
+]
+
+#indexes added to existing tables: (name, table, columns)
+ADDED_INDEXES = [
+    ('ix_report_timestamp_id', 'report', ('timestamp', 'id')),
+    ('ix_report_user_id_timestamp', 'report', ('user_id', 'timestamp')),
+    ('ix_report_model_type_result', 'report', ('model_type', 'result')),
+]
+
+#bump whenever upgrade() changes, so existing databases upgrade once
+SCHEMA_VERSION = 2
+
+#rows updated per transaction while backfilling
+BACKFILL_BATCH_SIZE = 1000
+
+
+def parse_input_data(input_data):
+    # "size=1.0,growth_rate=2.0" -> {'size': 1.0, 'growth_rate': 2.0}; None if malformed
+    try:
+        pairs = (item.split('=', 1) for item in input_data.split(','))
+        return {name.strip(): float(value) for name, value in pairs}
+    except (AttributeError, ValueError):
+        return None
+
+
+def backfill_reports(engine, batch_size=BACKFILL_BATCH_SIZE):
+    # fill user_id and features on reports saved before those columns existed,
+    # walking the table by id so each transaction stays small
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                'SELECT id, input_data FROM report '
+                'WHERE id > :last_id AND (user_id IS NULL OR features IS NULL) '
+                'ORDER BY id LIMIT :limit'
+            ), {'last_id': last_id, 'limit': batch_size}).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            conn.execute(text(
+                'UPDATE report SET user_id = (SELECT user.id FROM user WHERE user.username = report.user) '
+                'WHERE id BETWEEN :first_id AND :last_id AND user_id IS NULL'
+            ), {'first_id': rows[0].id, 'last_id': last_id})
+            features = [
+                {'id': row.id, 'features': json.dumps(parsed)}
+                for row in rows
+                if (parsed := parse_input_data(row.input_data)) is not None
+            ]
+            if features:
+                conn.execute(text(
+                    'UPDATE report SET features = :features WHERE id = :id AND features IS NULL'
+                ), features)
+
+
+def uses_autoincrement(conn, table):
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"),
+                       {'table': table}).scalar()
+    return sql is not None and 'AUTOINCREMENT' in sql.upper()
+
+
+def make_report_ids_autoincrement(conn):
+    # without AUTOINCREMENT SQLite hands the highest deleted (or archived) id to the next
+    # report; SQLite cannot add it in place, so the table is copied into a new one
+    if uses_autoincrement(conn, 'report'):
+        return
+    columns = conn.execute(text('PRAGMA table_info(report)')).fetchall()
+    definitions = ['id INTEGER PRIMARY KEY AUTOINCREMENT']
+    for column in columns:
+        if column.name == 'id':
+            continue
+        definition = f'{column.name} {column.type}'.strip()
+        if column.notnull:
+            definition += ' NOT NULL'
+        if column.dflt_value is not None:
+            definition += f' DEFAULT {column.dflt_value}'
+        definitions.append(definition)
+    for _, _, target_table, source, target, *_ in conn.execute(text('PRAGMA foreign_key_list(report)')):
+        definitions.append(f'FOREIGN KEY({source}) REFERENCES {target_table} ({target})')
+    names = ", ".join(column.name for column in columns)
+    conn.execute(text(f'CREATE TABLE report_new ({", ".join(definitions)})'))
+    # explicit ids also move sqlite_sequence up to the current max id
+    conn.execute(text(f'INSERT INTO report_new ({names}) SELECT {names} FROM report'))
+    conn.execute(text('DROP TABLE report'))
+    conn.execute(text('ALTER TABLE report_new RENAME TO report'))
+
+
+def rebuild_report_stats(engine):
+    # one pass over report to seed the counters; only runs while report_stat is empty
+    with engine.begin() as conn:
+        if conn.execute(text('SELECT 1 FROM report_stat LIMIT 1')).first():
+            return
+        conn.execute(text(
+            'INSERT INTO report_stat (user_id, model_type, result, day, count) '
+            "SELECT COALESCE(user_id, 0), COALESCE(model_type, ''), result, date(timestamp), COUNT(*) "
+            'FROM report GROUP BY 1, 2, 3, 4'
+        ))
+
+
+def schema_version(engine):
+    # stored in SQLite's user_version header field; 0 for databases never marked
+    with engine.connect() as conn:
+        return conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def mark_current(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def upgrade(engine):
+    # db.create_all() only creates missing tables, so new columns are added here
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, sql_type in ADDED_COLUMNS:
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {sql_type}'))
+        # the rebuilt table has no indexes yet; they are created below
+        make_report_ids_autoincrement(conn)
+        for name, table, columns in ADDED_INDEXES:
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+    backfill_reports(engine)
+    rebuild_report_stats(engine)
@@ -0,0 +1,103 @@
+#Lazy, hot-reloading registry for the joblib models
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+#model files live next to this module, so the app works from any working directory
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+#feature order, report type and labels for every model
+MODEL_SPECS = {
+    'tumor': {
+        'name': 'tumor',
+        'path': os.path.join(MODEL_DIR, "tumor_model.pkl"),
+        'model_type': "Tumor Prediction",
+        'features': ['size', 'growth_rate', 'roundness_score'],
+        'labels': ("Benign Tumor", "Malignant Tumor"),
+    },
+    'diabetes': {
+        'name': 'diabetes',
+        'path': os.path.join(MODEL_DIR, "diabetes_model.pkl"),
+        'model_type': "Diabetes Prediction",
+        'features': ['preg', 'glucose', 'bmi'],
+        'labels': ("Non-Diabetic", "Diabetic"),
+    },
+}
+
+#a loaded estimator, the object used for inference, and the version string recorded on reports
+LoadedModel = namedtuple('LoadedModel', ['model', 'engine', 'version', 'stamp'])
+
+
+def file_version(path):
+    # short content hash, identical across workers and restarts for the same pickle
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_model(path):
+    # mmap the numpy arrays inside the pickle so forked workers share the pages;
+    # compressed pickles cannot be mapped and are loaded normally
+    import joblib
+    try:
+        return joblib.load(path, mmap_mode='r')
+    except ValueError:
+        return joblib.load(path)
+
+
+class ModelRegistry:
+    """Loads each model on first use and swaps in a new version when its file changes.
+
+    Deploy retrained models by writing a new file and renaming it over the old
+    one (os.replace), so mapped pages of the previous version stay valid.
+    """
+
+    def __init__(self, paths, check_interval=2.0, prepare=None):
+        self.paths = dict(paths)
+        self.check_interval = check_interval
+        # prepare(estimator) -> inference engine, e.g. inference.compile_model
+        self.prepare = prepare or (lambda estimator: estimator)
+        self._models = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def names(self):
+        return list(self.paths)
+
+    def on_reload(self, callback):
+        # callback(name, loaded) runs whenever a version replaces a previously loaded one
+        self._listeners.append(callback)
+
+    def get(self, name):
+        loaded = self._models.get(name)
+        now = time.monotonic()
+        if loaded is not None and now - self._checked.get(name, 0) < self.check_interval:
+            return loaded
+
+        path = self.paths[name]
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        self._checked[name] = now
+        if loaded is not None and loaded.stamp == stamp:
+            return loaded
+
+        with self._lock:
+            loaded = self._models.get(name)
+            if loaded is None or loaded.stamp != stamp:
+                replaced = loaded is not None
+                model = load_model(path)
+                loaded = LoadedModel(model, self.prepare(model), file_version(path), stamp)
+                # single dict assignment: readers see either the old or the new version
+                self._models[name] = loaded
+                if replaced:
+                    for callback in self._listeners:
+                        callback(name, loaded)
+        return loaded
+
+    def version(self, name):
+        return self.get(name).version
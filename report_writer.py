@@ -0,0 +1,102 @@
+#Write-behind queue that persists reports in group commits
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class ReportWriter:
+    """Background thread that batches queued report rows into one transaction.
+
+    flush(rows) is called from the writer thread with every row collected
+    until max_batch rows are waiting or max_delay seconds have passed since
+    the first one, so many predictions share a single commit (and fsync).
+    submit() returns a Future that resolves once the rows are committed;
+    callers that need durability wait on it, the others return immediately.
+    If a group commit fails, each submitted batch is retried on its own so
+    one bad row only fails the request that sent it.
+    """
+
+    def __init__(self, flush, max_batch=500, max_delay=0.05, max_queue=10000):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='report-writer', daemon=True)
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, rows):
+        # blocks when max_queue batches are waiting, pushing back on producers
+        future = Future()
+        self._queue.put((list(rows), future))
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stop(self, timeout=10):
+        # flush everything already queued, then let the thread exit
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        items = [first]
+        count = len(first[0])
+        deadline = time.monotonic() + self.max_delay
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            count += len(item[0])
+        return items
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            items = self._collect()
+            if not items:
+                continue
+            if len(items) > 1:
+                try:
+                    self._write(items)
+                    continue
+                except Exception:
+                    logger.warning("Group commit of %d batches failed, retrying them one by one", len(items))
+            for item in items:
+                try:
+                    self._write([item])
+                except Exception as e:
+                    self._fail(item, e)
+
+    def _write(self, items):
+        rows = [row for batch, _ in items for row in batch]
+        self.flush(rows)
+        self.batches += 1
+        self.rows_written += len(rows)
+        for _, future in items:
+            future.set_result(len(rows))
+
+    def _fail(self, item, error):
+        # in async mode nobody waits on the future, so the log is the only trace of the lost rows
+        rows, future = item
+        self.rows_failed += len(rows)
+        logger.exception("Report writer dropped %d rows", len(rows))
+        future.set_exception(error)
@@ -0,0 +1,115 @@
+#Batch re-scoring of stored reports against the current model versions
+import json
+
+import numpy as np
+import pandas as pd
+
+from dashboard_data import report_source
+from migrations import parse_input_data
+from model_registry import MODEL_SPECS
+
+#report model_type -> model spec
+SPECS_BY_TYPE = {spec['model_type']: spec for spec in MODEL_SPECS.values()}
+
+#reports read and scored per chunk, so memory stays flat for very large sets
+RESCORE_CHUNK_ROWS = 50000
+
+#SQLite's default limit on bound parameters per statement is 999
+MAX_IDS_PER_QUERY = 900
+
+RESCORE_COLUMNS = ['id', 'user', 'model_type', 'result', 'probability', 'model_version', 'features', 'input_data']
+
+
+def _features(stored, input_data):
+    # the features JSON column, or the parsed input_data string for older reports
+    if isinstance(stored, str):
+        try:
+            stored = json.loads(stored)
+        except ValueError:
+            stored = None
+    return stored if isinstance(stored, dict) else parse_input_data(input_data)
+
+
+def feature_matrix(frame, features):
+    # float matrix in feature order; rows with missing or non-finite values come back as NaN
+    matrix = np.full((len(frame), len(features)), np.nan)
+    for i, (stored, input_data) in enumerate(zip(frame['features'], frame['input_data'])):
+        values = _features(stored, input_data)
+        if values is None:
+            continue
+        try:
+            matrix[i] = [float(values[name]) for name in features]
+        except (KeyError, TypeError, ValueError):
+            pass
+    return matrix
+
+
+def rescore_frame(frame, registry):
+    """Re-scores one frame of reports, one vectorized predict_proba per model type.
+
+    Returns the frame with new_result, new_probability, new_version and
+    changed columns; reports that cannot be scored get NaN / None.
+    """
+    out = frame.drop(columns=['features', 'input_data']).copy()
+    out['new_result'] = None
+    out['new_probability'] = np.nan
+    out['new_version'] = None
+    for model_type, group in frame.groupby('model_type', sort=False):
+        spec = SPECS_BY_TYPE.get(model_type)
+        if spec is None:
+            continue
+        matrix = feature_matrix(group, spec['features'])
+        valid = np.isfinite(matrix).all(axis=1)
+        if not valid.any():
+            continue
+        loaded = registry.get(spec['name'])
+        proba = loaded.engine.predict_proba(matrix[valid])
+        predictions = loaded.engine.classes_[proba.argmax(axis=1)]
+        index = group.index[valid]
+        out.loc[index, 'new_result'] = [spec['labels'][int(p)] for p in predictions]
+        out.loc[index, 'new_probability'] = proba[:, 1]
+        out.loc[index, 'new_version'] = loaded.version
+    out['changed'] = out['new_result'].notna() & (out['new_result'] != out['result'])
+    return out
+
+
+def iter_reports(conn, clauses=(), params=(), ids=None, chunk_rows=RESCORE_CHUNK_ROWS, include_archive=False):
+    # frames of RESCORE_COLUMNS for the given ids, or for every report matching the filter clauses
+    select = f"SELECT {', '.join(RESCORE_COLUMNS)} FROM {report_source(conn, RESCORE_COLUMNS, include_archive)}"
+    if ids is not None:
+        ids = [int(i) for i in ids]
+        for start in range(0, len(ids), MAX_IDS_PER_QUERY):
+            batch = ids[start:start + MAX_IDS_PER_QUERY]
+            yield pd.read_sql_query(f"{select} WHERE id IN ({', '.join('?' * len(batch))}) ORDER BY id",
+                                    conn, params=batch)
+        return
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    yield from pd.read_sql_query(f"{select}{where} ORDER BY id", conn, params=list(params), chunksize=chunk_rows)
+
+
+def rescore_reports(conn, registry, clauses=(), params=(), ids=None, chunk_rows=RESCORE_CHUNK_ROWS,
+                    include_archive=False):
+    """Re-scores the selected reports and returns (summary, changed).
+
+    summary counts reports per model type: rescored, changed and skipped
+    (no usable features or unknown model); changed lists every report whose
+    outcome differs under the current model.
+    """
+    summaries, changes = [], []
+    for frame in iter_reports(conn, clauses, params, ids, chunk_rows, include_archive):
+        if frame.empty:
+            continue
+        scored = rescore_frame(frame, registry)
+        summaries.append(scored.assign(rescored=scored['new_result'].notna())
+                         .groupby('model_type', dropna=False)[['rescored', 'changed']].sum()
+                         .assign(reports=scored.groupby('model_type', dropna=False).size()))
+        changes.append(scored[scored['changed']])
+    if not summaries:
+        return (pd.DataFrame(columns=['reports', 'rescored', 'changed', 'skipped']),
+                pd.DataFrame(columns=list(RESCORE_COLUMNS[:6]) + ['new_result', 'new_probability', 'new_version']))
+    # dropna=False here too, or reports without a model_type vanish from the totals
+    summary = pd.concat(summaries).groupby(level=0, dropna=False).sum()
+    summary['skipped'] = summary['reports'] - summary['rescored']
+    summary = summary[['reports', 'rescored', 'changed', 'skipped']]
+    changed = pd.concat(changes, ignore_index=True).drop(columns=['changed'])
+    return summary, changed
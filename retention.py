@@ -0,0 +1,178 @@
+#Report retention: move old reports to the archive database in batches, then compact the live file
+#usage: python retention.py [--days 365] [--batch 1000] [--dry-run] [--no-vacuum] [--convert]
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import database
+
+#reports older than this many days are archived (REPORT_RETENTION_DAYS overrides)
+RETENTION_DAYS = int(os.environ.get('REPORT_RETENTION_DAYS', 365))
+#reports moved per transaction, so the live table is never locked for long
+ARCHIVE_BATCH_SIZE = 1000
+#free pages released per incremental_vacuum step
+VACUUM_STEP_PAGES = 2000
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class ArchiveConflict(Exception):
+    """Raised when the archive already holds a different report under the same id."""
+
+
+def _columns(conn, schema):
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA {schema}.table_info(report)')]
+
+
+def _same_row(columns):
+    # archived copy a equals live row m in every column (IS treats two NULLs as equal)
+    return " AND ".join(f"a.{name} IS m.{name}" for name in columns)
+
+
+def ensure_archive(conn):
+    """Attaches the archive and mirrors the live report columns into archive.report.
+
+    Columns added to the live table later are added to the archive as well,
+    so archived rows keep every field. The live table must not reuse ids
+    (app migrations make it AUTOINCREMENT), and its id sequence is moved
+    past the highest archived id.
+    """
+    sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = 'report'").fetchone()
+    if sql is None or 'AUTOINCREMENT' not in sql[0].upper():
+        raise ArchiveConflict("report ids can be reused in this database; run `flask --app app init-db` first")
+    database.attach_archive(conn, create=True)
+    live = _columns(conn, 'main')
+    archived = {name for name, _ in _columns(conn, 'archive')}
+    if not archived:
+        conn.execute('PRAGMA archive.journal_mode=WAL')
+        definitions = ", ".join(f"{name} {sql_type or ''}".strip() + (" PRIMARY KEY" if name == 'id' else "")
+                                for name, sql_type in live)
+        conn.execute(f'CREATE TABLE archive.report ({definitions}, archived_at DATETIME)')
+        conn.execute('CREATE INDEX archive.ix_report_timestamp_id ON report (timestamp, id)')
+        conn.execute('CREATE INDEX archive.ix_report_user_id_timestamp ON report (user_id, timestamp)')
+        conn.execute('CREATE INDEX archive.ix_report_model_type_result ON report (model_type, result)')
+    else:
+        for name, sql_type in live:
+            if name not in archived:
+                conn.execute(f'ALTER TABLE archive.report ADD COLUMN {name} {sql_type}')
+    top = conn.execute('SELECT MAX(id) FROM archive.report').fetchone()[0]
+    if top is not None:
+        if not conn.execute("UPDATE main.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'report'",
+                            (top,)).rowcount:
+            conn.execute("INSERT INTO main.sqlite_sequence (name, seq) VALUES ('report', ?)", (top,))
+    conn.commit()
+    return [name for name, _ in live]
+
+
+def archive_reports(conn, days=RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """Moves reports older than `days` into archive.report, oldest first.
+
+    Each batch is copied and committed first, then deleted from the live
+    table, so a crash leaves a report in both files (the next run finishes
+    the move) but never in neither. A report is only deleted when the
+    archive holds an identical copy; a different row under the same id
+    raises ArchiveConflict. report_stat is left untouched: the dashboard
+    counts keep including archived reports.
+    """
+    cutoff = datetime.now() - timedelta(days=days)
+    # timestamps are stored as ISO text, so they compare as strings
+    before = cutoff.isoformat(' ')
+    if dry_run:
+        count = conn.execute('SELECT COUNT(*) FROM report WHERE timestamp < ?', (before,)).fetchone()[0]
+        return {'cutoff': cutoff, 'archived': 0, 'eligible': count, 'batches': 0}
+
+    names = ensure_archive(conn)
+    columns = ", ".join(names)
+    same = _same_row(names)
+    archived = batches = 0
+    while True:
+        ids = [row[0] for row in conn.execute(
+            'SELECT id FROM main.report WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?', (before, batch_size))]
+        if not ids:
+            break
+        marks = ", ".join('?' * len(ids))
+        conflicts = [row[0] for row in conn.execute(
+            f'SELECT m.id FROM main.report m JOIN archive.report a ON a.id = m.id '
+            f'WHERE m.id IN ({marks}) AND NOT ({same})', ids)]
+        if conflicts:
+            raise ArchiveConflict(f"archive holds different reports with ids {conflicts[:10]}")
+        # identical copies left by an interrupted run are already archived
+        conn.execute(f'INSERT INTO archive.report ({columns}, archived_at) '
+                     f'SELECT {columns}, ? FROM main.report m WHERE m.id IN ({marks}) '
+                     f'AND NOT EXISTS (SELECT 1 FROM archive.report a WHERE a.id = m.id)',
+                     [datetime.now().isoformat(' '), *ids])
+        conn.commit()
+        deleted = conn.execute(f'DELETE FROM main.report AS m WHERE m.id IN ({marks}) '
+                               f'AND EXISTS (SELECT 1 FROM archive.report a WHERE a.id = m.id AND {same})',
+                               ids).rowcount
+        if deleted != len(ids):
+            conn.rollback()
+            raise ArchiveConflict(f"only {deleted} of {len(ids)} reports matched their archived copy")
+        conn.commit()
+        archived += len(ids)
+        batches += 1
+    return {'cutoff': cutoff, 'archived': archived, 'batches': batches}
+
+
+def compact(conn, step_pages=VACUUM_STEP_PAGES, convert=False):
+    """Returns free pages to the OS with incremental VACUUM, a few thousand pages at a time.
+
+    Incremental vacuum only works once the file uses auto_vacuum=INCREMENTAL;
+    switching an existing database needs one full VACUUM, done only when
+    `convert` is set. Returns the number of pages released.
+    """
+    if conn.execute('PRAGMA main.auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        if not convert:
+            return None
+        conn.execute('PRAGMA main.auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM main')
+    released = 0
+    while True:
+        free = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+        if not free:
+            break
+        conn.execute(f'PRAGMA main.incremental_vacuum({min(free, step_pages)})').fetchall()
+        released += min(free, step_pages)
+    # with WAL the file only shrinks once the log is checkpointed
+    conn.execute('PRAGMA main.wal_checkpoint(TRUNCATE)').fetchall()
+    return released
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old reports and compact the live database")
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS, help="archive reports older than this")
+    parser.add_argument('--batch', type=int, default=ARCHIVE_BATCH_SIZE, help="reports moved per transaction")
+    parser.add_argument('--dry-run', action='store_true', help="only count the reports that would be archived")
+    parser.add_argument('--no-vacuum', action='store_true', help="skip the incremental VACUUM")
+    parser.add_argument('--convert', action='store_true',
+                        help="switch the database to auto_vacuum=INCREMENTAL (one full VACUUM)")
+    args = parser.parse_args(argv)
+
+    conn = database.connect()
+    try:
+        start = time.perf_counter()
+        try:
+            result = archive_reports(conn, args.days, args.batch, args.dry_run)
+        except ArchiveConflict as e:
+            print(f"archiving stopped: {e}", file=sys.stderr)
+            return 1
+        if args.dry_run:
+            print(f"{result['eligible']} reports older than {result['cutoff']:%Y-%m-%d} would be archived")
+            return 0
+        print(f"archived {result['archived']} reports older than {result['cutoff']:%Y-%m-%d} "
+              f"in {result['batches']} batches ({time.perf_counter() - start:.1f}s) to {database.ARCHIVE_PATH}")
+        if not args.no_vacuum:
+            released = compact(conn, convert=args.convert)
+            if released is None:
+                print("incremental vacuum is not enabled for this database; run once with --convert")
+            else:
+                print(f"released {released} free pages")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
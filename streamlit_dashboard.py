@@ -4,17 +4,44 @@ import seaborn as sns
 import matplotlib
 matplotlib.use('Agg')  # Use non-GUI backend for Flask apps
 import matplotlib.pyplot as plt
-import sqlite3
-import bcrypt
+import os
 import random
 from email.message import EmailMessage
-from fpdf import FPDF
 import smtplib
+import database
+import dashboard_data
+import exports
+import inference
+import rescoring
+from auth import AuthService
+from model_registry import ModelRegistry, MODEL_SPECS
 
 # --- Setup ---
 st.set_page_config(page_title="MediInsight", page_icon=":hospital:", layout="wide")
 st.title("\U0001F4CA MediInsight Prediction Dashboard")
 
+# --- Database ---
+@st.cache_resource
+def get_pool():
+    # one pool per Streamlit server process, shared across reruns and sessions
+    return database.ConnectionPool()
+
+@st.cache_resource
+def get_auth():
+    # same hashing service and cost policy as the Flask app
+    return AuthService(rounds=int(os.environ.get('BCRYPT_LOG_ROUNDS', 12)),
+                       workers=int(os.environ.get('AUTH_WORKERS', 4)),
+                       max_pending=int(os.environ.get('AUTH_MAX_PENDING', 64)))
+
+@st.cache_resource
+def get_registry():
+    # same models and compiled engines as the Flask app, reloaded when a pickle changes
+    return ModelRegistry({name: spec['path'] for name, spec in MODEL_SPECS.items()},
+                         prepare=inference.compile_model)
+
+pool = get_pool()
+auth = get_auth()
+
 # --- Theme Toggle ---
 with st.sidebar:
     theme = st.radio("🎨 Theme Mode", ["Light", "Dark"], key="theme_mode")
@@ -82,12 +109,9 @@ if st.session_state.forgot_password:
 
     if st.button("Reset Password"):
         if OTP_STORE.get(email) == entered_otp:
-            hashed_pw = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
-            conn = sqlite3.connect("instance/users.db")
-            cursor = conn.cursor()
-            cursor.execute("UPDATE user SET password = ? WHERE email = ?", (hashed_pw, email))
-            conn.commit()
-            conn.close()
+            hashed_pw = auth.hash_password(new_password)
+            with pool.connection() as conn:
+                conn.execute("UPDATE user SET password = ? WHERE email = ?", (hashed_pw, email))
             st.success("Password updated successfully.")
             st.session_state.forgot_password = False
         else:
@@ -104,15 +128,16 @@ if not st.session_state.logged_in:
 
         if submitted:
             try:
-                conn = sqlite3.connect('instance/users.db')
-                cursor = conn.cursor()
-                cursor.execute("SELECT password, is_admin FROM user WHERE username = ?", (username,))
-                row = cursor.fetchone()
-                conn.close()
+                with pool.connection() as conn:
+                    row = conn.execute("SELECT password, is_admin FROM user WHERE username = ?",
+                                       (username,)).fetchone()
 
                 if not row:
                     st.error("\u274C Username not found")
-                elif bcrypt.checkpw(password.encode(), row[0].encode()):
+                elif (check := auth.check_and_upgrade(row[0], password))[0]:
+                    if check[1]:
+                        with pool.connection() as conn:
+                            conn.execute("UPDATE user SET password = ? WHERE username = ?", (check[1], username))
                     st.session_state.logged_in = True
                     st.session_state.user = username
                     st.session_state.is_admin = bool(row[1])
@@ -136,24 +161,39 @@ with st.sidebar:
         st.experimental_rerun()
 
 # --- Load Data ---
-conn = sqlite3.connect("instance/users.db")
-df = pd.read_sql_query("SELECT * FROM report", conn)
-conn.close()
+@st.cache_resource(max_entries=64)
+def report_frame(user, model_type, result, include_archive=False):
+    # one incrementally refreshed frame per filter combination, shared across reruns
+    clauses, params = dashboard_data.report_filters(user, model_type, result)
+    return dashboard_data.ReportFrame(clauses, params, ttl=300, include_archive=include_archive)
 
-user_df = df if st.session_state.is_admin else df[df['user'] == st.session_state.user]
+scope_user = None if st.session_state.is_admin else st.session_state.user
 
 # --- Filters ---
+# filter options come from the small report_stat table, not from the reports themselves
+with pool.connection() as conn:
+    option_sql = "SELECT DISTINCT model_type, result FROM report_stat WHERE count > 0"
+    option_params = []
+    if scope_user is not None:
+        option_sql += " AND user_id = (SELECT id FROM user WHERE username = ?)"
+        option_params.append(scope_user)
+    options_df = pd.read_sql_query(option_sql, conn, params=option_params)
+
 st.sidebar.title("\U0001F4CB Filter Reports")
-model_types = user_df['model_type'].unique().tolist()
+model_types = options_df['model_type'].unique().tolist()
 selected_model = st.sidebar.selectbox("Select Model Type", options=["All"] + sorted(model_types))
-results = user_df['result'].unique().tolist()
+results = options_df['result'].unique().tolist()
 selected_result = st.sidebar.selectbox("Select Result", options=["All"] + sorted(results))
+# reports older than the retention period live in a separate archive database (see retention.py)
+include_archive = st.sidebar.checkbox("Include archived reports", value=False)
 
-filtered_df = user_df.copy()
-if selected_model != "All":
-    filtered_df = filtered_df[filtered_df['model_type'] == selected_model]
-if selected_result != "All":
-    filtered_df = filtered_df[filtered_df['result'] == selected_result]
+# filters are applied in SQL; only rows newer than the last load are fetched
+frame = report_frame(scope_user,
+                     None if selected_model == "All" else selected_model,
+                     None if selected_result == "All" else selected_result,
+                     include_archive)
+with pool.connection() as conn:
+    filtered_df = frame.get(conn)
 
 # --- Display Table ---
 st.subheader(f"\U0001F4C1 Reports for: {st.session_state.user}")
@@ -161,9 +201,26 @@ st.dataframe(filtered_df, use_container_width=True)
 
 # --- Chart ---
 st.subheader("\U0001F4C8 Prediction Chart")
-if not filtered_df.empty:
+# counts come from the precomputed report_stat table instead of recounting the dataframe
+stat_sql = "SELECT model_type, result, SUM(count) AS count FROM report_stat WHERE count > 0"
+stat_params = []
+if not st.session_state.is_admin:
+    stat_sql += " AND user_id = (SELECT id FROM user WHERE username = ?)"
+    stat_params.append(st.session_state.user)
+if selected_model != "All":
+    stat_sql += " AND model_type = ?"
+    stat_params.append(selected_model)
+if selected_result != "All":
+    stat_sql += " AND result = ?"
+    stat_params.append(selected_result)
+stat_sql += " GROUP BY model_type, result"
+with pool.connection() as conn:
+    stats_df = pd.read_sql_query(stat_sql, conn, params=stat_params)
+
+if not stats_df.empty:
     fig, ax = plt.subplots()
-    sns.countplot(data=filtered_df, x='model_type', hue='result', ax=ax)
+    sns.barplot(data=stats_df, x='model_type', y='count', hue='result', ax=ax)
+    ax.set_ylabel("count")
     plt.xticks(rotation=45)
     st.pyplot(fig)
 else:
@@ -173,35 +230,45 @@ else:
 st.subheader("\U0001F4E5 Export Report")
 col1, col2 = st.columns(2)
 
+# exports are built only when asked for, not on every rerun; rows are read one at a time
+# with itertuples(), but download_button needs the finished file, so it is held in memory
 with col1:
-    st.download_button("\U0001F4C3 Export CSV", filtered_df.to_csv(index=False), "report.csv", "text/csv")
+    if st.button("\U0001F4C3 Prepare CSV"):
+        csv_data = "".join(exports.iter_csv(filtered_df.itertuples(index=False)))
+        st.download_button("Download CSV", csv_data, "report.csv", "text/csv")
 
 with col2:
     if st.button("\U0001F4C4 Export PDF"):
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        for i, row in filtered_df.iterrows():
-            pdf.cell(200, 10, txt=f"{row['timestamp']} | {row['model_type']} | {row['result']}", ln=True)
-        pdf_path = f"{st.session_state.user}_report.pdf"
-        pdf.output(pdf_path)
-        with open(pdf_path, "rb") as f:
-            st.download_button("Download PDF", f, file_name=pdf_path, mime="application/pdf")
-
-# --- Re-run Demo ---
-st.subheader("\U0001F501 Re-run Prediction (Demo)")
-if not filtered_df.empty:
-    selected_row = st.selectbox("Select a report to re-run", filtered_df.index)
-    selected_report = filtered_df.loc[selected_row]
+        pdf_data = exports.summary_pdf(filtered_df.itertuples(index=False))
+        st.download_button("Download PDF", pdf_data, file_name=f"{st.session_state.user}_report.pdf",
+                           mime="application/pdf")
 
-    st.json({
-        "Model Type": selected_report["model_type"],
-        "Input Data": selected_report["input_data"],
-        "Previous Result": selected_report["result"]
-    })
+# --- Re-run Predictions ---
+st.subheader("\U0001F501 Re-run Predictions")
+if not filtered_df.empty:
+    scope = st.radio("Reports to re-run", ["Selected reports", "All filtered reports"], horizontal=True)
+    selected_ids = None
+    if scope == "Selected reports":
+        selected_ids = st.multiselect("Select reports to re-run", filtered_df['id'].tolist())
 
     if st.button("Re-run prediction"):
-        st.success(f"\u2705 Re-ran model: {selected_report['model_type']}")
-        st.info("\U0001F501 (Simulated — integrate ML models here)")
+        if selected_ids is not None and not selected_ids:
+            st.warning("Select at least one report.")
+        else:
+            # one vectorized predict per model type and chunk, against the current model versions
+            with st.spinner("Re-scoring reports..."):
+                with pool.connection() as conn:
+                    summary, changed = rescoring.rescore_reports(conn, get_registry(), frame.clauses, frame.params,
+                                                                 ids=selected_ids, include_archive=include_archive)
+            st.success(f"\u2705 Re-scored {int(summary['rescored'].sum())} reports, "
+                       f"{int(summary['changed'].sum())} changed outcome")
+            st.dataframe(summary, use_container_width=True)
+            if int(summary['skipped'].sum()):
+                st.info(f"{int(summary['skipped'].sum())} reports skipped (no usable input features)")
+            if not changed.empty:
+                st.markdown("**Changed outcomes**")
+                st.dataframe(changed, use_container_width=True)
+                st.download_button("Download changes (CSV)", changed.to_csv(index=False), "rerun_changes.csv",
+                                   "text/csv")
 else:
     st.info("No reports available for re-running.")
@@ -0,0 +1,5 @@
+#the app is a set of top-level modules, so tests import them from the repository root
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
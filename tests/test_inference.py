@@ -0,0 +1,85 @@
+#Parity of the compiled inference engine with the pickled sklearn models
+import glob
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+joblib = pytest.importorskip('joblib')
+pytest.importorskip('sklearn')
+
+import inference
+from model_registry import MODEL_DIR
+
+MODEL_PATHS = sorted(glob.glob(os.path.join(MODEL_DIR, '*.pkl')))
+
+
+@pytest.fixture(params=MODEL_PATHS, ids=os.path.basename)
+def estimator(request):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # pickles from another sklearn version warn on load
+        return joblib.load(request.param)
+
+
+def sklearn_outputs(estimator, X):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # feature-name warnings for plain arrays
+        return estimator.predict(X), estimator.predict_proba(X)
+
+
+def test_both_models_are_shipped():
+    assert [os.path.basename(path) for path in MODEL_PATHS] == ['diabetes_model.pkl', 'tumor_model.pkl']
+
+
+def test_batch_parity(estimator):
+    engine = inference.export(estimator)
+    assert engine is not None
+    X = inference.probe_inputs(engine.n_features, rows=5000, seed=7)
+    expected_pred, expected_proba = sklearn_outputs(estimator, X)
+    assert np.array_equal(engine.predict(X), expected_pred)
+    assert np.array_equal(engine.predict_proba(X), expected_proba)
+    assert engine.predict_proba(X).dtype == expected_proba.dtype
+
+
+def test_single_row_parity(estimator):
+    engine = inference.export(estimator)
+    X = inference.probe_inputs(engine.n_features, rows=200, seed=3)
+    for i in range(len(X)):
+        row = X[i:i + 1]
+        expected_pred, expected_proba = sklearn_outputs(estimator, row)
+        assert np.array_equal(engine.predict(row), expected_pred)
+        assert np.array_equal(engine.predict_proba(row), expected_proba)
+    # a plain list, as the form views pass it
+    expected_pred, expected_proba = sklearn_outputs(estimator, X[:1])
+    assert np.array_equal(engine.predict([X[0].tolist()]), expected_pred)
+    assert np.array_equal(engine.predict_proba([X[0].tolist()]), expected_proba)
+
+
+def test_compile_model_uses_engine(estimator):
+    assert isinstance(inference.compile_model(estimator), inference.LinearBinaryClassifier)
+
+
+def test_non_finite_input_rejected(estimator):
+    engine = inference.export(estimator)
+    with pytest.raises(ValueError):
+        engine.predict_proba([[np.nan] * engine.n_features])
+
+
+def test_unsupported_estimator_falls_back():
+    from sklearn.tree import DecisionTreeClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(50, 3))
+    tree = DecisionTreeClassifier(random_state=0).fit(X, X[:, 0] > 0)
+    assert inference.export(tree) is None
+    assert inference.compile_model(tree) is tree
+
+
+def test_multiclass_logistic_regression_falls_back():
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(90, 3))
+    model = LogisticRegression().fit(X, np.arange(90) % 3)
+    assert inference.compile_model(model) is model